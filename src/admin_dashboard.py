@@ -130,70 +130,77 @@ This module provides the UI and logic for the admin dashboard,
 including adding and deleting people from the dataset.
 """
 
+import io
 import streamlit as st
-import os
-import sys
-import subprocess
-from pathlib import Path
+from config import ENROLLMENT_STATUS_REFRESH
 from utils import save_image, delete_person, list_people
+from dataset_catalog import get_dataset_catalog, make_thumbnail
+from face_recognition_service import get_gallery_registry
+from enrollment_jobs import EnrollmentQueue, DONE, FAILED
 
-def run_encoding_script():
+@st.cache_resource
+def get_enrollment_queue():
+    """Creates the process-wide enrollment queue, publishing into the live gallery."""
+    return EnrollmentQueue(publish=get_gallery_registry().reload)
+
+def run_encoding_script(kind="rebuild", note=None):
     """
-    Runs the encode_faces.py script as a subprocess and shows the status.
+    Queues a rebuild of the face model and returns immediately.
+
+    Args:
+        kind (str): A label for the job, e.g. "enroll" or "rebuild".
+        note (str, optional): A short description of the change, shown with the job.
+
+    Returns:
+        EnrollmentJob: The job that will pick up this change.
     """
-    try:
-        with st.spinner("🔄 New data saved. Re-training face model... This may take a moment."):
-            # Find the correct path to encode_faces.py
-            # This works both locally and on Streamlit Cloud
-            current_dir = Path(__file__).parent
-            encode_script = current_dir / "encode_faces.py"
-            
-            if not encode_script.exists():
-                st.error(f"❌ Error: 'encode_faces.py' not found at {encode_script}")
-                return False
-            
-            # Run the encoding script
-            result = subprocess.run(
-                [sys.executable, str(encode_script)],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=60  # 60 second timeout
-            )
-            
-            # Show output in a success message instead of expander
-            if result.stdout:
-                st.info("📋 Encoding Process Completed")
-                # Show a summary instead of full log
-                lines = result.stdout.strip().split('\n')
-                if lines:
-                    st.code(lines[-1])  # Show just the last line (summary)
-            
-            # Clear the cache to force reload of encodings
-            st.cache_resource.clear()
-            st.success("✅ Face model updated successfully!")
-            return True
-            
-    except FileNotFoundError:
-        st.error("❌ Error: 'encode_faces.py' not found. Make sure it's in the src folder.")
-        return False
-    except subprocess.TimeoutExpired:
-        st.error("⏱️ Encoding process timed out. Too many images or server overload.")
-        return False
-    except subprocess.CalledProcessError as e:
-        st.error(f"❌ The encoding script failed:")
-        if e.stderr:
-            st.code(e.stderr)
-        return False
-    except Exception as e:
-        st.error(f"❌ An unexpected error occurred: {e}")
-        return False
+    job = get_enrollment_queue().submit(kind, note)
+    st.toast(f"🔄 Face model update #{job.id} queued")
+    return job
+
+def show_enrollment_status():
+    """
+    Displays the progress of the most recent face model update, refreshing it while the update runs.
+    """
+    job = get_enrollment_queue().latest
+    if job is None:
+        return
+    running = job.status not in (DONE, FAILED)
+    st.fragment(_show_job_status, run_every=ENROLLMENT_STATUS_REFRESH if running else None)(running)
+
+def _show_job_status(running):
+    """
+    Displays the state of the most recent face model update.
+
+    Args:
+        running (bool): Whether the update was still running when the page was drawn.
+    """
+    job = get_enrollment_queue().latest
+    if running and job.status in (DONE, FAILED):
+        # Redraw the whole page, so the dataset views show the update and the polling stops
+        st.rerun()
+
+    if job.status == DONE:
+        result = job.result
+        st.success(
+            f"✅ Face model update #{job.id} finished: {result['faces']} faces "
+            f"({result['encoded']} images encoded, {result['reused']} reused)."
+        )
+        for img_path, error in result["errors"]:
+            st.warning(f"⚠️ Could not process {img_path}: {error}")
+    elif job.status == FAILED:
+        st.error(f"❌ Face model update #{job.id} failed: {job.error}")
+    else:
+        progress = job.done / job.total if job.total else 0.0
+        label = f"🔄 Face model update #{job.id} {job.status}: {job.done}/{job.total} images"
+        st.progress(progress, text=label)
 
 def show_admin_dashboard():
     """
     Displays the admin dashboard.
     """
     st.subheader("🛠️ Manage Dataset")
+    show_enrollment_status()
     
     with st.expander("➕ Add New Person to Database", expanded=True):
         person_name = st.text_input("Enter the person's name", key="new_person_name")
@@ -209,9 +216,8 @@ def show_admin_dashboard():
                     st.success(f"✅ Image for '{person_name}' saved successfully!")
                     
                     # Automatically re-train after adding
-                    if run_encoding_script():
-                        st.balloons()
-                        st.rerun()
+                    run_encoding_script("enroll", person_name)
+                    st.rerun()
                 else:
                     st.error("❌ Please provide both a name and an image file.")
         
@@ -219,6 +225,7 @@ def show_admin_dashboard():
             # Initialize session state for storing captured images
             if 'captured_images' not in st.session_state:
                 st.session_state.captured_images = []
+                st.session_state.captured_thumbnails = []
             
             # Display the camera input only if we haven't reached the max limit
             if len(st.session_state.captured_images) < 6:
@@ -230,6 +237,8 @@ def show_admin_dashboard():
                 # When a new photo is taken, add it to our list and rerun
                 if camera_photo:
                     st.session_state.captured_images.append(camera_photo)
+                    # Shrink the photo once instead of sending it full size on every rerun
+                    st.session_state.captured_thumbnails.append(make_thumbnail(io.BytesIO(camera_photo.getvalue())))
                     st.rerun()
             else:
                 st.success("✅ Maximum of 6 images captured. You can now save them.")
@@ -238,9 +247,9 @@ def show_admin_dashboard():
             if st.session_state.captured_images:
                 st.write("📷 Captured Images:")
                 cols = st.columns(6)
-                for i, photo in enumerate(st.session_state.captured_images):
+                for i, thumbnail in enumerate(st.session_state.captured_thumbnails):
                     with cols[i]:
-                        st.image(photo, width=100)
+                        st.image(thumbnail, width=100)
                 
                 # Add buttons for saving or clearing the captured images
                 col1, col2 = st.columns(2)
@@ -254,17 +263,18 @@ def show_admin_dashboard():
                             
                             # Clear the list after saving
                             st.session_state.captured_images = []
+                            st.session_state.captured_thumbnails = []
                             
                             # Automatically re-train after adding
-                            if run_encoding_script():
-                                st.balloons()
-                                st.rerun()
+                            run_encoding_script("enroll", person_name)
+                            st.rerun()
                         else:
                             st.error("❌ Please enter the person's name before saving.")
                 
                 with col2:
                     if st.button("❌ Clear Captured Images", use_container_width=True):
                         st.session_state.captured_images = []
+                        st.session_state.captured_thumbnails = []
                         st.rerun()
     
     with st.expander("🗑️ Delete Person"):
@@ -277,22 +287,43 @@ def show_admin_dashboard():
                     st.success(f"✅ Successfully deleted all records and images for {to_delete}.")
                     
                     # Automatically re-train after deleting
-                    if run_encoding_script():
-                        st.rerun()
+                    run_encoding_script("delete", to_delete)
+                    st.rerun()
         else:
             st.info("ℹ️ No people found in the database to delete.")
     
     with st.expander("📊 Database Status"):
-        people = list_people()
-        if people:
-            st.write(f"**Total People in Database:** {len(people)}")
-            st.write("**People:**")
-            for person in people:
-                person_dir = os.path.join("dataset", person)
-                if os.path.exists(person_dir):
-                    num_images = len([f for f in os.listdir(person_dir) 
-                                    if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-                    st.write(f"- {person}: {num_images} images")
+        # Rendered from the dataset catalog, without walking the dataset directory
+        catalog = get_dataset_catalog()
+        summary = catalog.summary()
+        if summary:
+            total_images = sum(person["images"] for person in summary)
+            total_mb = sum(person["bytes"] for person in summary) / (1024 * 1024)
+            st.write(f"**Total People in Database:** {len(summary)}")
+            st.write(f"**Total Images:** {total_images} ({total_mb:.1f} MB)")
+            st.dataframe(
+                [
+                    {
+                        "Person": person["name"],
+                        "Images": person["images"],
+                        "Encoded Faces": person["faces"],
+                        "Size (MB)": round(person["bytes"] / (1024 * 1024), 2),
+                    }
+                    for person in summary
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+            
+            preview = st.selectbox("Preview images of", [person["name"] for person in summary], key="catalog_preview")
+            thumbnails = catalog.thumbnails(preview)
+            if thumbnails:
+                st.image(thumbnails, width=100)
         else:
             st.info("No people in database yet.")
+        
+        if st.button("🔄 Rescan Dataset", key="rescan_dataset"):
+            with st.spinner("Rescanning the dataset..."):
+                catalog.rebuild()
+            st.rerun()
 
@@ -8,9 +8,10 @@ including various charts and data visualizations.
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import numpy as np
 from pandas.api.types import CategoricalDtype
-import os
-from config import LOG_FILE, REQUIRED_HOURS_FULL_DAY, REQUIRED_HOURS_HALF_DAY
+from config import REQUIRED_HOURS_FULL_DAY, REQUIRED_HOURS_HALF_DAY
+from attendance import get_attendance_store
 
 def decimal_to_time(decimal_hours):
     """
@@ -25,61 +26,103 @@ def decimal_to_time(decimal_hours):
 def calculate_working_hours(df):
     """
     Calculate working hours and attendance status for each employee.
+
+    Within each (Name, Date), a Punch In opens a shift unless one is already
+    open, and a Punch Out closes the open shift, if any. The pairing is done
+    on whole columns: sort once, carry the last punch forward within each
+    group, and mask the rows that open and close shifts.
+
+    The dashboard itself reads the stores' daily summary through
+    `daily_attendance`; this function computes the same table straight from
+    punches and is the reference the summary is tested against.
     """
-    df = df.sort_values(['Name', 'DateTime'])
-    results_list = []
-    
-    for (name, date), group in df.groupby(['Name', 'Date']):
-        date_obj = pd.to_datetime(date).date()
-        day_of_week = date_obj.strftime('%A')
-        
-        if day_of_week == 'Sunday':
-            continue
-            
-        punches = group.sort_values('DateTime')
-        
-        working_seconds = 0
-        punch_in_time = None
-        first_punch_in = None
-        last_punch_out = None
-        
-        for _, row in punches.iterrows():
-            if row['Status'] == 'Punch In':
-                if punch_in_time is None: 
-                    punch_in_time = row['DateTime']
-                    if first_punch_in is None:
-                        first_punch_in = punch_in_time
-            elif row['Status'] == 'Punch Out':
-                if punch_in_time is not None: 
-                    working_seconds += (row['DateTime'] - punch_in_time).total_seconds()
-                    last_punch_out = row['DateTime']
-                    punch_in_time = None 
-        
-        working_hours = working_seconds / 3600
-        formatted_time = decimal_to_time(working_hours)
-        
-        if working_hours >= REQUIRED_HOURS_FULL_DAY:
-            status = "Full Day"
-        elif working_hours >= REQUIRED_HOURS_HALF_DAY:
-            status = "Half Day"
-        else:
-            status = "Absent"
-        
-        results_list.append({
-            'Name': name,
-            'Date': date,
-            'WorkingHours': round(working_hours, 2),
-            'FormattedTime': formatted_time,
-            'AttendanceStatus': status,
-            'PunchIn': first_punch_in.time() if first_punch_in else None,
-            'PunchOut': last_punch_out.time() if last_punch_out else None,
-            'DayOfWeek': day_of_week
-        })
-
-    if not results_list:
-        return pd.DataFrame(columns=['Name', 'Date', 'WorkingHours', 'FormattedTime', 'AttendanceStatus', 'PunchIn', 'PunchOut', 'DayOfWeek'])
-        
-    return pd.DataFrame(results_list)
+    columns = ['Name', 'Date', 'WorkingHours', 'FormattedTime', 'AttendanceStatus', 'PunchIn', 'PunchOut', 'DayOfWeek']
+
+    days = pd.to_datetime(df['Date'])
+    df = df.assign(_Day=days)[days.dt.day_name() != 'Sunday']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    df = df.sort_values(['Name', '_Day', 'DateTime'], kind='stable')
+
+    # Each (Name, Date) group is now a contiguous run of rows
+    names = df['Name'].to_numpy()
+    day = df['_Day'].to_numpy()
+    starts = np.r_[True, (names[1:] != names[:-1]) | (day[1:] != day[:-1])]
+    group = np.cumsum(starts) - 1
+    n_groups = group[-1] + 1
+
+    # Whether a shift is open before each row: the previous In/Out punch of the group was a Punch In
+    status = df['Status'].reset_index(drop=True)
+    is_in = (status == 'Punch In').to_numpy()
+    is_out = (status == 'Punch Out').to_numpy()
+    last_punch = status.where(is_in | is_out).groupby(group).ffill()
+    open_before = (last_punch.groupby(group).shift() == 'Punch In').to_numpy()
+    opens = is_in & ~open_before
+    closes = is_out & open_before
+
+    times = df['DateTime'].reset_index(drop=True)
+    opened_at = times.where(opens).groupby(group).ffill()
+    shift_seconds = (times - opened_at)[closes].dt.total_seconds().to_numpy()
+    working_seconds = np.bincount(group[closes], weights=shift_seconds, minlength=n_groups)
+
+    working_hours = working_seconds / 3600
+    total_seconds = (working_hours * 3600).astype(int)
+    formatted_time = [
+        f"{h:02d}:{m:02d}:{s:02d}"
+        for h, m, s in zip(total_seconds // 3600, (total_seconds % 3600) // 60, total_seconds % 60)
+    ]
+    status_labels = np.select(
+        [working_hours >= REQUIRED_HOURS_FULL_DAY, working_hours >= REQUIRED_HOURS_HALF_DAY],
+        ["Full Day", "Half Day"],
+        default="Absent",
+    )
+
+    def clock_times(mask, pick):
+        stamps = getattr(times[mask].groupby(group[mask]), pick)().reindex(range(n_groups))
+        return [None if pd.isna(t) else t.time() for t in stamps]
+
+    return pd.DataFrame({
+        'Name': names[starts],
+        'Date': df['Date'].to_numpy()[starts],
+        'WorkingHours': [round(h, 2) for h in working_hours.tolist()],
+        'FormattedTime': formatted_time,
+        'AttendanceStatus': status_labels,
+        'PunchIn': clock_times(opens, 'first'),
+        'PunchOut': clock_times(closes, 'last'),
+        'DayOfWeek': pd.DatetimeIndex(day[starts]).day_name(),
+    }, columns=columns)
+
+def daily_attendance(summary):
+    """
+    Turn the store's daily summary into the working-hours table used by the dashboard.
+
+    The result has the same columns and values as `calculate_working_hours`
+    on the punches of the same days.
+    """
+    columns = ['Name', 'Date', 'WorkingHours', 'FormattedTime', 'AttendanceStatus', 'PunchIn', 'PunchOut', 'DayOfWeek']
+
+    days = pd.to_datetime(summary['Date'], format='%Y-%m-%d')
+    keep = (days.dt.day_name() != 'Sunday').to_numpy()
+    summary, days = summary[keep], days[keep]
+    if summary.empty:
+        return pd.DataFrame(columns=columns)
+
+    working_hours = summary['WorkingSeconds'].to_numpy(dtype=float) / 3600
+
+    def clock_times(values):
+        stamps = pd.to_datetime(values, format='%H:%M:%S', errors='coerce')
+        return [None if pd.isna(t) else t.time() for t in stamps]
+
+    return pd.DataFrame({
+        'Name': summary['Name'].to_numpy(),
+        'Date': days.dt.date.to_numpy(),
+        'WorkingHours': [round(h, 2) for h in working_hours.tolist()],
+        'FormattedTime': [decimal_to_time(h) for h in working_hours.tolist()],
+        'AttendanceStatus': summary['Status'].to_numpy(),
+        'PunchIn': clock_times(summary['FirstIn']),
+        'PunchOut': clock_times(summary['LastOut']),
+        'DayOfWeek': days.dt.day_name().to_numpy(),
+    }, columns=columns)
 
 def create_employee_timeline(df, employee_name, start_date, end_date):
     """
@@ -111,18 +154,11 @@ def show_analytics_dashboard():
         st.rerun()
     
     try:
-        if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) > 0:
-            df = pd.read_csv(LOG_FILE)
-            df["DateTime"] = pd.to_datetime(df["Date"] + " " + df["Time"])
-            df["Date"] = pd.to_datetime(df["Date"]).dt.date
-            df["Time"] = pd.to_datetime(df["Time"], format='%H:%M:%S').dt.time
-            df["HourDecimal"] = df["Time"].apply(lambda t: t.hour + t.minute/60 + t.second/3600)
-            df["DayOfWeek"] = df["DateTime"].dt.day_name()
-            df["Hour"] = df["DateTime"].dt.hour
-            
+        store = get_attendance_store()
+        bounds = store.date_bounds()
+        if bounds is not None:
             st.sidebar.header("Filters")
-            min_date = df["Date"].min()
-            max_date = df["Date"].max()
+            min_date, max_date = (pd.to_datetime(d, format='%Y-%m-%d').date() for d in bounds)
             
             date_range = st.sidebar.date_input(
                 "Date Range", value=(min_date, max_date), min_value=min_date, max_value=max_date
@@ -130,19 +166,16 @@ def show_analytics_dashboard():
             
             start_date, end_date = (date_range[0], date_range[1]) if len(date_range) == 2 else (min_date, max_date)
             
-            all_employees = sorted(df["Name"].unique())
+            all_employees = store.names()
             selected_employees = st.sidebar.multiselect("Employees", options=all_employees, default=all_employees)
             
-            filtered_df = df[
-                (df["Date"] >= start_date) & 
-                (df["Date"] <= end_date) &
-                (df["Name"].isin(selected_employees))
-            ].sort_values("DateTime")
+            # The store keeps one summary row per person and day, so raw punches are not paired here
+            summary = store.read_summary(start_date.isoformat(), end_date.isoformat(), selected_employees)
             
-            if filtered_df.empty:
+            if summary.empty:
                 st.warning("No attendance data found for the selected filters.")
             else:
-                attendance_status = calculate_working_hours(filtered_df)
+                attendance_status = daily_attendance(summary)
                 day_order = CategoricalDtype(
                     ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], ordered=True
                 )
@@ -212,6 +245,10 @@ def show_analytics_dashboard():
 
                 with raw_data_tab:
                     st.subheader("Attendance Punch Records (Filtered)")
+                    filtered_df = store.read(start_date.isoformat(), end_date.isoformat(), selected_employees)
+                    filtered_df["DateTime"] = pd.to_datetime(filtered_df["Date"] + " " + filtered_df["Time"], format="%Y-%m-%d %H:%M:%S")
+                    filtered_df["DayOfWeek"] = filtered_df["DateTime"].dt.day_name()
+                    filtered_df = filtered_df.sort_values("DateTime")
                     display_records = filtered_df[['Name', 'Date', 'Time', 'Status', 'DayOfWeek']]
                     st.dataframe(display_records)
                     
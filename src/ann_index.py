@@ -0,0 +1,265 @@
+"""
+Approximate nearest-neighbour index for the Face Recognition Attendance System.
+
+This module provides an inverted-file (IVF) index over the enrolled face
+encodings. A k-means coarse quantizer splits the gallery into lists, and a
+query only scans the lists whose centroids are closest to it, so matching
+cost no longer grows linearly with the number of enrolled faces.
+
+Run this file directly to print a recall/latency report against the exact scan.
+"""
+
+import os
+import time
+import numpy as np
+from config import ANN_INDEX_FILE, ANN_NUM_LISTS, ANN_NUM_PROBES
+
+INDEX_FORMAT_VERSION = 1
+
+
+def _sq_distances(queries, points, point_sq_norms):
+    """Returns the squared Euclidean distances between every query and every point."""
+    q_norms = np.einsum("ij,ij->i", queries, queries)
+    sq_dists = q_norms[:, None] + point_sq_norms[None, :] - 2.0 * (queries @ points.T)
+    np.maximum(sq_dists, 0.0, out=sq_dists)
+    return sq_dists
+
+
+def gallery_fingerprint(matrix):
+    """
+    Computes a cheap fingerprint of a gallery matrix.
+
+    Used to detect an index that was built for a different set of encodings.
+
+    Args:
+        matrix (np.ndarray): The gallery matrix.
+
+    Returns:
+        float: The fingerprint value.
+    """
+    return float(np.asarray(matrix, dtype=np.float64).sum())
+
+
+def kmeans(points, n_clusters, n_iter=20, seed=0):
+    """
+    Clusters points with Lloyd's algorithm.
+
+    Args:
+        points (np.ndarray): A (n, d) float32 matrix.
+        n_clusters (int): The number of clusters.
+        n_iter (int): The maximum number of iterations.
+        seed (int): The random seed for the initial centroids.
+
+    Returns:
+        tuple: The (n_clusters, d) centroids and the cluster id of every point.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)].copy()
+    assignments = np.full(len(points), -1)
+
+    for _ in range(n_iter):
+        c_norms = np.einsum("ij,ij->i", centroids, centroids)
+        sq_dists = _sq_distances(points, centroids, c_norms)
+        new_assignments = np.argmin(sq_dists, axis=1)
+        if np.array_equal(new_assignments, assignments):
+            break
+        assignments = new_assignments
+
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, points)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+
+        # Re-seed empty clusters with the points furthest from their centroid
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            residuals = sq_dists[np.arange(len(points)), assignments]
+            far = np.argsort(residuals)[::-1][:len(empty)]
+            centroids[empty] = points[far]
+
+    return centroids, assignments
+
+
+class IVFIndex:
+    """
+    An inverted-file index over a gallery matrix.
+
+    The index only stores the centroids and the gallery row ids grouped by
+    list; the encodings themselves stay in the caller's matrix.
+    """
+
+    def __init__(self, centroids, list_offsets, list_ids, n_probe=ANN_NUM_PROBES):
+        """
+        Initializes the IVFIndex.
+
+        Args:
+            centroids (np.ndarray): The (n_lists, d) coarse quantizer centroids.
+            list_offsets (np.ndarray): The start of each list in `list_ids`, plus the end.
+            list_ids (np.ndarray): The gallery row ids, grouped by list.
+            n_probe (int): The number of lists scanned per query.
+        """
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+        self.list_ids = np.asarray(list_ids, dtype=np.int64)
+        self.n_probe = n_probe
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix, n_lists=ANN_NUM_LISTS, n_probe=ANN_NUM_PROBES, n_iter=20, seed=0):
+        """
+        Builds an index for a gallery matrix.
+
+        Args:
+            matrix (np.ndarray): The (n, d) gallery matrix.
+            n_lists (int): The number of lists. 0 picks sqrt(n).
+            n_probe (int): The number of lists scanned per query.
+            n_iter (int): The maximum number of k-means iterations.
+            seed (int): The random seed for k-means.
+
+        Returns:
+            IVFIndex: The built index.
+        """
+        points = np.ascontiguousarray(matrix, dtype=np.float32)
+        if len(points) == 0:
+            raise ValueError("Cannot build an index for an empty gallery")
+        if not n_lists:
+            n_lists = int(np.sqrt(len(points)))
+        n_lists = max(1, min(n_lists, len(points)))
+
+        centroids, assignments = kmeans(points, n_lists, n_iter=n_iter, seed=seed)
+        list_ids = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        return cls(centroids, list_offsets, list_ids, n_probe=n_probe)
+
+    def search(self, matrix, sq_norms, queries):
+        """
+        Finds the approximate nearest gallery row for each query.
+
+        Args:
+            matrix (np.ndarray): The gallery matrix the index was built for.
+            sq_norms (np.ndarray): The squared norms of the gallery rows.
+            queries (np.ndarray): A (num_queries, d) float32 matrix.
+
+        Returns:
+            tuple: The best row index and its distance, one entry per query.
+        """
+        n_probe = max(1, min(self.n_probe, self.n_lists))
+        centroid_dists = _sq_distances(queries, self.centroids, self.centroid_sq_norms)
+        probes = np.argpartition(centroid_dists, n_probe - 1, axis=1)[:, :n_probe]
+
+        best_ids = np.empty(len(queries), dtype=np.int64)
+        best_dists = np.empty(len(queries), dtype=np.float32)
+        for i, lists in enumerate(probes):
+            candidates = np.concatenate(
+                [self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists]
+            )
+            sq_dists = _sq_distances(queries[i:i + 1], matrix[candidates], sq_norms[candidates])[0]
+            best = np.argmin(sq_dists)
+            best_ids[i] = candidates[best]
+            best_dists[i] = np.sqrt(sq_dists[best])
+        return best_ids, best_dists
+
+    def save(self, path, matrix):
+        """
+        Saves the index next to the encodings.
+
+        Args:
+            path (str): The file to write.
+            matrix (np.ndarray): The gallery matrix the index was built for.
+        """
+        # Replaced atomically, so a loading app never sees a partly written index
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=INDEX_FORMAT_VERSION,
+                centroids=self.centroids,
+                list_offsets=self.list_offsets,
+                list_ids=self.list_ids,
+                gallery_size=len(matrix),
+                fingerprint=gallery_fingerprint(matrix),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, matrix, n_probe=ANN_NUM_PROBES):
+        """
+        Loads an index, checking that it matches the given gallery.
+
+        Args:
+            path (str): The index file.
+            matrix (np.ndarray): The gallery matrix the index should belong to.
+            n_probe (int): The number of lists scanned per query.
+
+        Returns:
+            IVFIndex: The index, or None if it is missing or stale.
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as f:
+            if int(f["version"]) != INDEX_FORMAT_VERSION or int(f["gallery_size"]) != len(matrix):
+                return None
+            if not np.isclose(float(f["fingerprint"]), gallery_fingerprint(matrix)):
+                return None
+            return cls(f["centroids"], f["list_offsets"], f["list_ids"], n_probe=n_probe)
+
+
+def recall_report(matrix, index, num_queries=500, noise=0.02, seed=0):
+    """
+    Compares the index against the exact scan.
+
+    Queries are gallery encodings with a little Gaussian noise added, which
+    mimics a new photo of an enrolled person.
+
+    Args:
+        matrix (np.ndarray): The gallery matrix.
+        index (IVFIndex): The index to evaluate.
+        num_queries (int): The number of queries to run.
+        noise (float): The standard deviation of the added noise.
+        seed (int): The random seed.
+
+    Returns:
+        dict: The recall@1 and mean per-query latency of both searches.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(matrix), min(num_queries, len(matrix)), replace=False)
+    queries = (matrix[picks] + rng.normal(0, noise, matrix[picks].shape)).astype(np.float32)
+
+    start = time.perf_counter()
+    exact = np.empty(len(queries), dtype=np.int64)
+    for i in range(len(queries)):
+        exact[i] = np.argmin(_sq_distances(queries[i:i + 1], matrix, sq_norms)[0])
+    exact_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx = np.concatenate([index.search(matrix, sq_norms, queries[i:i + 1])[0] for i in range(len(queries))])
+    approx_time = time.perf_counter() - start
+
+    return {
+        "gallery_size": len(matrix),
+        "n_lists": index.n_lists,
+        "n_probe": index.n_probe,
+        "recall_at_1": float(np.mean(exact == approx)),
+        "exact_ms_per_query": 1000 * exact_time / len(queries),
+        "ann_ms_per_query": 1000 * approx_time / len(queries),
+    }
+
+
+if __name__ == "__main__":
+    from gallery_store import load_gallery
+
+    data = load_gallery()
+    if data is None:
+        raise SystemExit("No gallery found. Please run 'encode_faces.py'.")
+    gallery = np.asarray(data["encodings"], dtype=np.float32)
+    ivf = IVFIndex.load(ANN_INDEX_FILE, gallery) or IVFIndex.build(gallery)
+    for key, value in recall_report(gallery, ivf).items():
+        print(f"{key}: {value}")
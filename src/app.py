@@ -158,6 +158,8 @@ import streamlit as st
 st.set_page_config(page_title="Face Recognition System", layout="wide")
 
 # Now import other modules
+import contextlib
+import threading
 from streamlit_webrtc import webrtc_streamer
 from face_recognition_service import FaceRecognitionTransformer
 from chatbot_service import AttendanceChatbot
@@ -165,9 +167,8 @@ from auth import login_form
 from admin_dashboard import show_admin_dashboard
 from analytics_dashboard import show_analytics_dashboard
 from dotenv import load_dotenv
-import os
-import pandas as pd
-from config import LOG_FILE
+from chat_context import get_context_builder
+from attendance import get_attendance_store
 
 def main():
     """
@@ -294,17 +295,43 @@ def main():
                 # Add user message to chat history
                 st.session_state.chat_history.append({"role": "user", "content": prompt})
                 
+                # Structured lookups are answered straight from the attendance store
+                response = st.session_state.chatbot.answer_locally(prompt, role=st.session_state.role)
+                
                 # Prepare context for the chatbot
                 attendance_data = None
-                if st.session_state.role == "admin" and os.path.exists(LOG_FILE):
+                data_version = None
+                if response is None and st.session_state.role == "admin":
                     try:
-                        df = pd.read_csv(LOG_FILE)
-                        attendance_data = df.to_string()
+                        # A compact, budgeted summary focused on the people and dates in the question
+                        data_version = get_attendance_store().version()
+                        attendance_data = get_context_builder().build(prompt)
                     except Exception as e:
                         st.error(f"⚠️ Error reading attendance log: {e}")
                 
-                # Get assistant response
-                response = st.session_state.chatbot.get_response(prompt, attendance_data)
+                # Stop the answer still streaming from an earlier run of this session
+                if st.session_state.get("chat_cancel") is not None:
+                    st.session_state.chat_cancel.set()
+                st.session_state.chat_cancel = threading.Event()
+                
+                # Otherwise stream the assistant response as it is generated
+                if response is None:
+                    with chat_container:
+                        with st.chat_message("user", avatar="👤"):
+                            st.markdown(prompt)
+                        with st.chat_message("assistant", avatar="🤖"):
+                            placeholder = st.empty()
+                            response = ""
+                            stream = st.session_state.chatbot.stream_response(
+                                prompt, attendance_data, role=st.session_state.role, data_version=data_version,
+                                cancel=st.session_state.chat_cancel,
+                            )
+                            # Closing the stream also cancels the request if this run is interrupted
+                            with contextlib.closing(stream):
+                                for chunk in stream:
+                                    response += chunk
+                                    placeholder.markdown(response + "▌")
+                            placeholder.markdown(response)
                 
                 # Add assistant response to chat history
                 st.session_state.chat_history.append({"role": "assistant", "content": response})
@@ -317,8 +344,17 @@ def main():
                 st.markdown("---")
                 st.markdown("### 💬 Chat Controls")
                 if st.button("🗑️ Clear Chat History", use_container_width=True):
+                    if st.session_state.get("chat_cancel") is not None:
+                        st.session_state.chat_cancel.set()
                     st.session_state.chat_history = []
                     st.rerun()
+                if st.session_state.role == "admin":
+                    cache_stats = st.session_state.chatbot.cache.stats()
+                    st.caption(
+                        f"Response cache: {cache_stats['hit_rate']:.0%} hits "
+                        f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}), "
+                        f"{cache_stats['saved_seconds']:.1f}s saved"
+                    )
                 
                 # Show chat statistics
                 if st.session_state.get("chat_history", []):
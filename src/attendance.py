@@ -0,0 +1,978 @@
+"""
+Attendance storage for the Face Recognition Attendance System.
+
+Punches are kept either in the append-only CSV log or in an SQLite database.
+Both stores expose the same small repository API (`record`, `read`,
+`read_summary`, `date_bounds`, `names`) used by the video service, the
+analytics dashboard and the chatbot.
+
+Both stores also maintain a daily summary per (Name, Date): working seconds,
+first Punch In, last Punch Out and status. It is advanced by each committed
+punch, and only a day that receives an out-of-order punch is rebuilt from
+its punches, so readers never have to pair raw punches themselves.
+
+With the CSV store, instead of re-reading and rewriting the whole file on
+every punch, the writer keeps the last status of each person for the current
+day in memory and appends a single line per punch. On startup the index is
+rebuilt from the tail of the log only.
+"""
+
+import collections
+import csv
+import io
+import os
+import sqlite3
+import threading
+from datetime import datetime
+import pandas as pd
+import attendance_archive
+from config import (
+    LOG_FILE,
+    ATTENDANCE_TAIL_BLOCK_SIZE,
+    ATTENDANCE_BACKEND,
+    ATTENDANCE_DB_FILE,
+    ATTENDANCE_DURABILITY,
+    ATTENDANCE_ARCHIVE,
+    ATTENDANCE_ARCHIVE_DIR,
+    REQUIRED_HOURS_FULL_DAY,
+    REQUIRED_HOURS_HALF_DAY,
+)
+
+LOG_COLUMNS = ["Name", "Date", "Time", "Status"]
+PUNCH_IN = "Punch In"
+PUNCH_OUT = "Punch Out"
+SUMMARY_COLUMNS = ["Name", "Date", "WorkingSeconds", "FirstIn", "LastOut", "Status"]
+
+
+def next_status(last_status):
+    """
+    Returns the status of the next punch given the last one of the day.
+
+    Args:
+        last_status (str): The last status recorded today, or None.
+
+    Returns:
+        str: "Punch Out" after a "Punch In", otherwise "Punch In".
+    """
+    return PUNCH_OUT if last_status == PUNCH_IN else PUNCH_IN
+
+
+def day_status(working_seconds):
+    """
+    Classifies a day by the time worked.
+
+    Args:
+        working_seconds (float): The time between paired punches.
+
+    Returns:
+        str: "Full Day", "Half Day" or "Absent".
+    """
+    working_hours = working_seconds / 3600
+    if working_hours >= REQUIRED_HOURS_FULL_DAY:
+        return "Full Day"
+    if working_hours >= REQUIRED_HOURS_HALF_DAY:
+        return "Half Day"
+    return "Absent"
+
+
+def _clock_seconds(time_str):
+    hours, minutes, seconds = (int(part) for part in time_str.split(":"))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def new_day_summary(name, date_str):
+    """
+    Returns the summary of a day without punches.
+
+    Besides the SUMMARY_COLUMNS, the summary holds the "OpenSince" time of the
+    open shift and the "LastPunch" time, both needed to advance it.
+
+    Args:
+        name (str): The person's name.
+        date_str (str): The date, as YYYY-MM-DD.
+
+    Returns:
+        dict: The empty day.
+    """
+    return {
+        "Name": name,
+        "Date": date_str,
+        "WorkingSeconds": 0,
+        "FirstIn": None,
+        "LastOut": None,
+        "Status": day_status(0),
+        "OpenSince": None,
+        "LastPunch": None,
+    }
+
+
+def apply_punch(day, status, time_str):
+    """
+    Advances a day summary by one punch.
+
+    A Punch In opens a shift unless one is already open, and a Punch Out
+    closes the open shift, if any, the same pairing the analytics dashboard uses.
+
+    Args:
+        day (dict): The summary to update in place.
+        status (str): The status of the punch.
+        time_str (str): The time of the punch, as HH:MM:SS, not earlier than the day's last punch.
+    """
+    if status == PUNCH_IN:
+        if day["OpenSince"] is None:
+            day["OpenSince"] = time_str
+            if day["FirstIn"] is None:
+                day["FirstIn"] = time_str
+    elif status == PUNCH_OUT and day["OpenSince"] is not None:
+        day["WorkingSeconds"] += _clock_seconds(time_str) - _clock_seconds(day["OpenSince"])
+        day["LastOut"] = time_str
+        day["OpenSince"] = None
+    day["LastPunch"] = max(day["LastPunch"] or time_str, time_str)
+    day["Status"] = day_status(day["WorkingSeconds"])
+
+
+def summarize_day(name, date_str, punches):
+    """
+    Builds the summary of a day from all of its punches.
+
+    Args:
+        name (str): The person's name.
+        date_str (str): The date, as YYYY-MM-DD.
+        punches (list): The (time, status) pairs of the day, in log order.
+
+    Returns:
+        dict: The day summary.
+    """
+    day = new_day_summary(name, date_str)
+    # sorted is stable, so punches in the same second keep their log order
+    for time_str, status in sorted(punches, key=lambda punch: punch[0]):
+        apply_punch(day, status, time_str)
+    return day
+
+
+def read_tail_rows(log_file, since_date, block_size=ATTENDANCE_TAIL_BLOCK_SIZE):
+    """
+    Reads the rows at the end of the log dated on or after a given date.
+
+    The log is written in chronological order, so the file is read backwards
+    block by block until a row from an earlier date shows up.
+
+    Args:
+        log_file (str): The attendance log.
+        since_date (str): The earliest date to return, as YYYY-MM-DD.
+        block_size (int): The number of bytes read per step.
+
+    Returns:
+        list: The matching rows as dictionaries, in file order.
+    """
+    if not os.path.exists(log_file):
+        return []
+
+    with open(log_file, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = complete = b""
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            buffer = f.read(step) + buffer
+            # Drop the first line unless it starts at the beginning of the file; it may be partial
+            if position > 0:
+                if b"\n" not in buffer:
+                    continue
+                complete = buffer.split(b"\n", 1)[1]
+            else:
+                complete = buffer
+            first = next(csv.reader(io.StringIO(complete.decode("utf-8"))), None)
+            if first and len(first) == len(LOG_COLUMNS) and first[0] != "Name" and first[1] < since_date:
+                break
+
+    rows = []
+    for row in csv.reader(io.StringIO(complete.decode("utf-8"))):
+        if len(row) != len(LOG_COLUMNS) or row == LOG_COLUMNS:
+            continue
+        record = dict(zip(LOG_COLUMNS, row))
+        if record["Date"] >= since_date:
+            rows.append(record)
+    return rows
+
+
+class AttendanceWriter:
+    """
+    Appends punches to the attendance log in constant time.
+
+    The writer is safe to share between threads. It assumes it is the only
+    writer of the log file while it is alive.
+    """
+
+    def __init__(self, log_file=LOG_FILE, durability=ATTENDANCE_DURABILITY):
+        """
+        Initializes the AttendanceWriter and rebuilds today's index from the log tail.
+
+        Args:
+            log_file (str): The attendance log.
+            durability (str): "full" to fsync the log after every write, "normal" to leave it to the OS.
+        """
+        self.log_file = log_file
+        self.durability = durability
+        self._lock = threading.Lock()
+        self._date = None
+        self._last_status = {}
+        self._load_day(datetime.now().strftime("%Y-%m-%d"))
+
+    def _load_day(self, date_str):
+        """Rebuilds the last-status index for a day from the end of the log."""
+        self._date = date_str
+        self._last_status = {}
+        for row in read_tail_rows(self.log_file, date_str):
+            if row["Date"] == date_str:
+                self._last_status[row["Name"]] = row["Status"]
+
+    def last_status(self, name, date_str):
+        """
+        Returns the last status recorded for a person on a day.
+
+        Args:
+            name (str): The person's name.
+            date_str (str): The date, as YYYY-MM-DD.
+
+        Returns:
+            str: The last status, or None if there was no punch that day.
+        """
+        with self._lock:
+            if date_str != self._date:
+                self._load_day(date_str)
+            return self._last_status.get(name)
+
+    def record(self, name, now=None):
+        """
+        Appends the next punch for a person.
+
+        Args:
+            name (str): The person's name.
+            now (datetime, optional): The time of the punch. Defaults to now.
+
+        Returns:
+            dict: The record that was written, with "Name", "Date", "Time" and "Status".
+        """
+        return self.record_batch([(name, now)])[0]
+
+    def record_batch(self, events):
+        """
+        Appends the next punch for several people with a single write.
+
+        Args:
+            events (list): The (name, now) pairs to record, in order. `now` may be None.
+
+        Returns:
+            list: The records that were written, in the same order.
+        """
+        with self._lock:
+            records = []
+            for name, now in events:
+                now = now or datetime.now()
+                date_str = now.strftime("%Y-%m-%d")
+                # A new day starts with an empty index
+                if date_str != self._date:
+                    self._load_day(date_str)
+                status = next_status(self._last_status.get(name))
+                self._last_status[name] = status
+                records.append({"Name": name, "Date": date_str, "Time": now.strftime("%H:%M:%S"), "Status": status})
+
+            try:
+                self._append(records)
+            except Exception:
+                # Resynchronize the index with what actually reached the log
+                self._load_day(self._date)
+                raise
+        return records
+
+    def _append(self, records):
+        directory = os.path.dirname(self.log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        with open(self.log_file, "a+", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            if size == 0:
+                writer.writerow(LOG_COLUMNS)
+            else:
+                # Make sure the new rows do not run into an unterminated last line
+                f.seek(size - 1)
+                if f.read(1) != "\n":
+                    f.write("\n")
+            writer.writerows([record[column] for column in LOG_COLUMNS] for record in records)
+            if self.durability == "full":
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def _typed_punches(df):
+    """Adds the parsed "Day" of each punch, used for date filters."""
+    return df.assign(Day=pd.to_datetime(df["Date"], format="%Y-%m-%d"))
+
+
+class CsvAttendanceStore(AttendanceWriter):
+    """
+    The attendance repository backed by the CSV log.
+
+    The parsed log is cached and keyed on the file identity, size and
+    modification time. When the log has only grown, just the appended bytes
+    are parsed. The daily summary is kept in memory; it is built from the
+    whole log on the first `read_summary` and afterwards advanced by the
+    rows appended to the log, whoever wrote them. It is rebuilt when the log
+    is replaced.
+
+    With an archive directory, closed months are moved out of the log into
+    monthly partitions (see attendance_archive.py) whenever a new month
+    starts, and reads combine the partitions they overlap with the log.
+    Punches backfilled into a closed month are merged into its partition.
+    """
+
+    def __init__(self, log_file=LOG_FILE, durability=ATTENDANCE_DURABILITY, archive_dir=None):
+        """
+        Initializes the CsvAttendanceStore.
+
+        Args:
+            log_file (str): The attendance log.
+            durability (str): "full" to fsync the log after every write, "normal" to leave it to the OS.
+            archive_dir (str, optional): The directory to roll closed months into. None keeps everything in the log.
+        """
+        super().__init__(log_file, durability)
+        self.archive_dir = archive_dir
+        self._summary_lock = threading.Lock()
+        self._summary = None
+        # The log cache key and row count the summary reflects
+        self._summary_key = None
+        self._summary_rows = 0
+        self._frame_lock = threading.Lock()
+        self._frame = _typed_punches(pd.DataFrame(columns=LOG_COLUMNS))
+        self._frame_key = None
+        self._names = []
+        self._index = None
+        self._index_mtime = None
+        self._archived_for = None
+        if self.archive_dir:
+            self.archive_closed_months()
+
+    def _archive_index(self):
+        """Returns the archive's partition index, re-reading it only when it changed."""
+        if not self.archive_dir:
+            return None
+        try:
+            mtime = os.stat(os.path.join(self.archive_dir, attendance_archive.INDEX_FILE)).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._index_mtime:
+            self._index, self._index_mtime = attendance_archive.read_index(self.archive_dir), mtime
+        return self._index
+
+    def archive_closed_months(self, today=None):
+        """
+        Moves the punches of every month before the current one from the log into the archive.
+
+        Args:
+            today (datetime, optional): The current day. Defaults to today.
+
+        Returns:
+            int: The number of punches archived.
+        """
+        with self._summary_lock:
+            return self._archive_closed_months(today)
+
+    def _archive_closed_months(self, today=None):
+        month = (today or datetime.now()).strftime("%Y-%m")
+        self._archived_for = month
+        with self._lock:
+            df = self._punches()[LOG_COLUMNS]
+            months = df["Date"].str[:7]
+            closed = months < month
+            if not closed.any():
+                return 0
+
+            index = self._archive_index()
+            done = attendance_archive.archived_through(index)
+            for closed_month, punches in df[closed].groupby(months[closed], sort=True):
+                if done is not None and closed_month <= done:
+                    punches = self._backfilled(closed_month, punches, index)
+                    if punches is None:
+                        continue
+                days = {}
+                for row in punches.itertuples(index=False):
+                    days.setdefault((row.Name, row.Date), []).append((row.Time, row.Status))
+                summary = pd.DataFrame(
+                    [[day[c] for c in SUMMARY_COLUMNS] for day in (summarize_day(*key, p) for key, p in days.items())],
+                    columns=SUMMARY_COLUMNS,
+                )
+                attendance_archive.save_partition(closed_month, punches, summary, self.archive_dir)
+
+            # The current month stays behind as the hot log
+            tmp_path = self.log_file + ".tmp"
+            df[~closed].to_csv(tmp_path, index=False, lineterminator="\n")
+            os.replace(tmp_path, self.log_file)
+            self._summary = None
+            return int(closed.sum())
+
+    def _backfilled(self, month, punches, index):
+        """
+        Merges the log's punches of an archived month into its partition.
+
+        The log can still hold rows of an archived month for two reasons: an
+        earlier run was interrupted after writing the partition, which then
+        holds every one of them, or punches were backfilled into the month
+        since, which are merged in.
+
+        Returns:
+            pd.DataFrame: The partition's punches followed by the log's, or None if the partition already has them.
+        """
+        archived = attendance_archive.read_punches(month + "-01", month + "-31", None, self.archive_dir, index)
+        logged = collections.Counter(punches[LOG_COLUMNS].itertuples(index=False, name=None))
+        if not logged - collections.Counter(archived[LOG_COLUMNS].itertuples(index=False, name=None)):
+            return None
+        return pd.concat([archived, punches[LOG_COLUMNS]], ignore_index=True)
+
+    def _hot(self, start_date=None, end_date=None, names=None, df=None):
+        """Returns the typed punches of the log, or of `df`, that match the filters and are not archived."""
+        df = self._punches() if df is None else df
+        done = attendance_archive.archived_through(self._archive_index())
+        if done is not None:
+            df = df[df["Day"] >= pd.Timestamp(done + "-01") + pd.offsets.MonthBegin(1)]
+        if start_date is not None:
+            df = df[df["Day"] >= pd.Timestamp(str(start_date))]
+        if end_date is not None:
+            df = df[df["Day"] <= pd.Timestamp(str(end_date))]
+        if names is not None:
+            df = df[df["Name"].isin(list(names))]
+        return df
+
+    def _punches(self):
+        """Returns every punch in the log, parsing only what was appended since the last call."""
+        return self._snapshot()[0]
+
+    def _snapshot(self):
+        """Returns the parsed log together with its cache key, both from the same parse."""
+        with self._frame_lock:
+            try:
+                stat = os.stat(self.log_file)
+            except OSError:
+                self._frame, self._frame_key, self._names = _typed_punches(pd.DataFrame(columns=LOG_COLUMNS)), None, []
+                return self._frame, self._frame_key
+
+            # (device, inode, bytes parsed, size, mtime) of the cached frame; mtime alone can
+            # miss an append within the filesystem's timestamp granularity
+            cached = self._frame_key
+            if cached and cached[:2] == (stat.st_dev, stat.st_ino) and cached[3:] == (stat.st_size, stat.st_mtime_ns):
+                return self._frame, self._frame_key
+            grown = cached and cached[:2] == (stat.st_dev, stat.st_ino) and 0 < cached[2] <= stat.st_size
+            start = cached[2] if grown else 0
+
+            with open(self.log_file, "rb") as f:
+                f.seek(start)
+                data = f.read(stat.st_size - start)
+            # Leave a line that is still being written for the next call
+            end = data.rfind(b"\n") + 1
+            data = data[:end]
+
+            if not grown:
+                frame = pd.read_csv(io.BytesIO(data), dtype=str) if data else pd.DataFrame(columns=LOG_COLUMNS)
+                self._frame = _typed_punches(frame[LOG_COLUMNS])
+                self._names = sorted(self._frame["Name"].unique())
+            elif data:
+                tail = _typed_punches(pd.read_csv(io.BytesIO(data), header=None, names=LOG_COLUMNS, dtype=str))
+                self._frame = pd.concat([self._frame, tail], ignore_index=True)
+                self._names = sorted(set(self._names).union(tail["Name"].unique()))
+            # A header-only file must be parsed again from the start, with its header
+            parsed = start + end if len(self._frame) else 0
+            self._frame_key = (stat.st_dev, stat.st_ino, parsed, stat.st_size, stat.st_mtime_ns)
+            return self._frame, self._frame_key
+
+    def record_batch(self, events):
+        with self._summary_lock:
+            if self.archive_dir and datetime.now().strftime("%Y-%m") != self._archived_for:
+                # A new month has started; roll the previous one out of the log first
+                self._archive_closed_months()
+            records = super().record_batch(events)
+            if self.archive_dir and any(record["Date"][:7] < self._archived_for for record in records):
+                # Punches backfilled into a closed month go straight into its partition
+                self._archive_closed_months()
+            return records
+
+    def _sync_summary(self):
+        """
+        Brings the summary up to date with the log. Called with the summary lock held.
+
+        Rows appended since the last call, by this store or any other writer,
+        advance the summary; a log that was replaced or truncated, e.g. by
+        archiving or a manual edit, is summarized again from scratch.
+        """
+        frame, key = self._snapshot()
+        if key == self._summary_key and self._summary is not None:
+            return
+        previous = self._summary_key
+        appended = (
+            self._summary is not None
+            and previous is not None
+            and key is not None
+            and key[:2] == previous[:2]
+            and key[2] >= previous[2]
+            and len(frame) >= self._summary_rows
+        )
+        if appended:
+            self._advance_summary(frame, self._hot(df=frame.iloc[self._summary_rows:]))
+        else:
+            self._summary = self._build_summary(frame)
+        self._summary_key, self._summary_rows = key, len(frame)
+
+    def _advance_summary(self, frame, new):
+        """Applies newly appended punches to the summary."""
+        for key, punches in new[LOG_COLUMNS].groupby(["Name", "Date"], sort=False):
+            times = punches["Time"].tolist()
+            day = self._summary.get(key)
+            in_order = times == sorted(times) and (day is None or day["LastPunch"] is None or times[0] >= day["LastPunch"])
+            if in_order:
+                day = day or self._summary.setdefault(key, new_day_summary(*key))
+                for time_str, status in zip(times, punches["Status"].tolist()):
+                    apply_punch(day, status, time_str)
+            else:
+                # An out-of-order punch changes the pairing, so rebuild the day from the log
+                rows = frame[(frame["Name"] == key[0]) & (frame["Date"] == key[1])]
+                self._summary[key] = summarize_day(*key, list(zip(rows["Time"], rows["Status"])))
+
+    def _build_summary(self, frame):
+        days = {}
+        for row in self._hot(df=frame)[LOG_COLUMNS].itertuples(index=False):
+            days.setdefault((row.Name, row.Date), []).append((row.Time, row.Status))
+        return {key: summarize_day(*key, punches) for key, punches in days.items()}
+
+    def read_summary(self, start_date=None, end_date=None, names=None):
+        """
+        Reads the daily summary, optionally restricted to a date range and a set of people.
+
+        Args:
+            start_date (str, optional): The first date to include, as YYYY-MM-DD.
+            end_date (str, optional): The last date to include, as YYYY-MM-DD.
+            names (list, optional): The people to include.
+
+        Returns:
+            pd.DataFrame: One row per person and day with the SUMMARY_COLUMNS, sorted by name and date.
+        """
+        with self._summary_lock:
+            self._sync_summary()
+            names = set(names) if names is not None else None
+            rows = [
+                [day[column] for column in SUMMARY_COLUMNS]
+                for (name, date_str), day in self._summary.items()
+                if (start_date is None or date_str >= str(start_date))
+                and (end_date is None or date_str <= str(end_date))
+                and (names is None or name in names)
+            ]
+        hot = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+        index = self._archive_index()
+        if index is None:
+            return hot.sort_values(["Name", "Date"], ignore_index=True)
+        archived = attendance_archive.read_summary(start_date, end_date, names, self.archive_dir, index)
+        frames = [frame for frame in (archived, hot) if not frame.empty]
+        if not frames:
+            return hot
+        return pd.concat(frames, ignore_index=True).sort_values(["Name", "Date"], ignore_index=True)
+
+    def read(self, start_date=None, end_date=None, names=None):
+        """
+        Reads punches, optionally restricted to a date range and a set of people.
+
+        Args:
+            start_date (str, optional): The first date to include, as YYYY-MM-DD.
+            end_date (str, optional): The last date to include, as YYYY-MM-DD.
+            names (list, optional): The people to include.
+
+        Returns:
+            pd.DataFrame: The punches with "Name", "Date", "Time" and "Status" columns, in log order.
+        """
+        hot = self._hot(start_date, end_date, names)[LOG_COLUMNS].reset_index(drop=True)
+        index = self._archive_index()
+        if index is None:
+            return hot
+        archived = attendance_archive.read_punches(start_date, end_date, names, self.archive_dir, index)
+        frames = [frame for frame in (archived, hot) if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else hot
+
+    def date_bounds(self):
+        """
+        Returns the first and last dates in the log.
+
+        Returns:
+            tuple: The (min_date, max_date) strings, or None if there are no punches.
+        """
+        days = self._hot()["Day"]
+        bounds = [(days.min().strftime("%Y-%m-%d"), days.max().strftime("%Y-%m-%d"))] if not days.empty else []
+        index = self._archive_index()
+        bounds += [(p["min_date"], p["max_date"]) for p in (index or {}).get("partitions", [])]
+        if not bounds:
+            return None
+        return min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+    def names(self):
+        """
+        Returns everyone who has punched at least once.
+
+        Returns:
+            list: The sorted names.
+        """
+        self._punches()
+        index = self._archive_index()
+        if index is None:
+            return list(self._names)
+        return sorted(set(self._names).union(*(p["names"] for p in index["partitions"])))
+
+    def version(self):
+        """
+        Returns a value that changes whenever punches are added, for use in cache keys.
+
+        Returns:
+            tuple: The identity, size and mtime of the log and the archive index.
+        """
+        self._punches()
+        self._archive_index()
+        return self._frame_key, self._index_mtime
+
+
+class SqliteAttendanceStore:
+    """
+    The attendance repository backed by SQLite in WAL mode.
+
+    Punches are indexed on (name, date) and on date, so the punch state of a
+    person and date-range queries do not scan the whole history, and readers
+    do not block the camera writers. The daily summary is a table updated in
+    the same transaction as the punches.
+    """
+
+    def __init__(self, db_file=ATTENDANCE_DB_FILE, import_from=LOG_FILE, durability=ATTENDANCE_DURABILITY):
+        """
+        Initializes the SqliteAttendanceStore, creating the schema if needed.
+
+        Args:
+            db_file (str): The SQLite database file.
+            import_from (str, optional): A CSV log imported when the database is new and empty.
+            durability (str): "full" to sync the database on every commit, "normal" to sync at WAL checkpoints only.
+        """
+        self.db_file = db_file
+        self.durability = durability
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS punches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                date TEXT NOT NULL,
+                time TEXT NOT NULL,
+                status TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_punches_name_date ON punches (name, date);
+            CREATE INDEX IF NOT EXISTS idx_punches_date ON punches (date);
+            CREATE TABLE IF NOT EXISTS daily_summary (
+                name TEXT NOT NULL,
+                date TEXT NOT NULL,
+                working_seconds REAL NOT NULL,
+                first_in TEXT,
+                last_out TEXT,
+                status TEXT NOT NULL,
+                open_since TEXT,
+                last_punch TEXT,
+                PRIMARY KEY (name, date)
+            );
+            CREATE INDEX IF NOT EXISTS idx_daily_summary_date ON daily_summary (date);
+            """
+        )
+        empty = conn.execute("SELECT 1 FROM punches LIMIT 1").fetchone() is None
+        if empty and import_from and os.path.exists(import_from) and os.path.getsize(import_from) > 0:
+            self.import_csv(import_from)
+        elif not empty and conn.execute("SELECT 1 FROM daily_summary LIMIT 1").fetchone() is None:
+            # A database from before the summary existed
+            self.rebuild_summary()
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.db_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_file, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=FULL" if self.durability == "full" else "PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def last_status(self, name, date_str):
+        """
+        Returns the last status recorded for a person on a day.
+
+        Args:
+            name (str): The person's name.
+            date_str (str): The date, as YYYY-MM-DD.
+
+        Returns:
+            str: The last status, or None if there was no punch that day.
+        """
+        row = self._connect().execute(
+            "SELECT status FROM punches WHERE name = ? AND date = ? ORDER BY id DESC LIMIT 1",
+            (name, date_str),
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, name, now=None):
+        """
+        Inserts the next punch for a person.
+
+        Args:
+            name (str): The person's name.
+            now (datetime, optional): The time of the punch. Defaults to now.
+
+        Returns:
+            dict: The record that was written, with "Name", "Date", "Time" and "Status".
+        """
+        return self.record_batch([(name, now)])[0]
+
+    def record_batch(self, events):
+        """
+        Inserts the next punch for several people in a single transaction.
+
+        Args:
+            events (list): The (name, now) pairs to record, in order. `now` may be None.
+
+        Returns:
+            list: The records that were written, in the same order.
+        """
+        conn = self._connect()
+        records = []
+        # IMMEDIATE takes the write lock up front, so two writers cannot read the same last status
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name, now in events:
+                now = now or datetime.now()
+                record = {"Name": name, "Date": now.strftime("%Y-%m-%d"), "Time": now.strftime("%H:%M:%S")}
+                record["Status"] = next_status(self.last_status(name, record["Date"]))
+                conn.execute(
+                    "INSERT INTO punches (name, date, time, status) VALUES (?, ?, ?, ?)",
+                    (record["Name"], record["Date"], record["Time"], record["Status"]),
+                )
+                self._advance_summary(conn, record)
+                records.append(record)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return records
+
+    def _load_day(self, conn, name, date_str):
+        row = conn.execute(
+            "SELECT working_seconds, first_in, last_out, status, open_since, last_punch "
+            "FROM daily_summary WHERE name = ? AND date = ?",
+            (name, date_str),
+        ).fetchone()
+        if row is None:
+            return None
+        day = new_day_summary(name, date_str)
+        for key, value in zip(["WorkingSeconds", "FirstIn", "LastOut", "Status", "OpenSince", "LastPunch"], row):
+            day[key] = value
+        return day
+
+    def _save_day(self, conn, day):
+        conn.execute(
+            "INSERT OR REPLACE INTO daily_summary "
+            "(name, date, working_seconds, first_in, last_out, status, open_since, last_punch) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                day["Name"], day["Date"], day["WorkingSeconds"], day["FirstIn"],
+                day["LastOut"], day["Status"], day["OpenSince"], day["LastPunch"],
+            ),
+        )
+
+    def _rebuild_day(self, conn, name, date_str):
+        punches = conn.execute(
+            "SELECT time, status FROM punches WHERE name = ? AND date = ? ORDER BY id", (name, date_str)
+        ).fetchall()
+        self._save_day(conn, summarize_day(name, date_str, punches))
+
+    def _advance_summary(self, conn, record):
+        day = self._load_day(conn, record["Name"], record["Date"])
+        if day is not None and day["LastPunch"] is not None and record["Time"] < day["LastPunch"]:
+            # An out-of-order punch changes the pairing, so rebuild the day from its punches
+            self._rebuild_day(conn, record["Name"], record["Date"])
+            return
+        day = day or new_day_summary(record["Name"], record["Date"])
+        apply_punch(day, record["Status"], record["Time"])
+        self._save_day(conn, day)
+
+    def rebuild_summary(self):
+        """Rebuilds the daily summary from every punch, e.g. after the working-hour thresholds changed."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM daily_summary")
+            for name, date_str in conn.execute("SELECT DISTINCT name, date FROM punches").fetchall():
+                self._rebuild_day(conn, name, date_str)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(self, start_date=None, end_date=None, names=None):
+        """
+        Reads punches, optionally restricted to a date range and a set of people.
+
+        Args:
+            start_date (str, optional): The first date to include, as YYYY-MM-DD.
+            end_date (str, optional): The last date to include, as YYYY-MM-DD.
+            names (list, optional): The people to include.
+
+        Returns:
+            pd.DataFrame: The punches with "Name", "Date", "Time" and "Status" columns, in insertion order.
+        """
+        where, params = self._filters(start_date, end_date, names)
+        if where is None:
+            return pd.DataFrame(columns=LOG_COLUMNS)
+        query = f"SELECT name AS Name, date AS Date, time AS Time, status AS Status FROM punches {where} ORDER BY id"
+        return pd.read_sql_query(query, self._connect(), params=params)
+
+    def read_summary(self, start_date=None, end_date=None, names=None):
+        """
+        Reads the daily summary, optionally restricted to a date range and a set of people.
+
+        Args:
+            start_date (str, optional): The first date to include, as YYYY-MM-DD.
+            end_date (str, optional): The last date to include, as YYYY-MM-DD.
+            names (list, optional): The people to include.
+
+        Returns:
+            pd.DataFrame: One row per person and day with the SUMMARY_COLUMNS, sorted by name and date.
+        """
+        where, params = self._filters(start_date, end_date, names)
+        if where is None:
+            return pd.DataFrame(columns=SUMMARY_COLUMNS)
+        query = (
+            "SELECT name AS Name, date AS Date, working_seconds AS WorkingSeconds, first_in AS FirstIn, "
+            f"last_out AS LastOut, status AS Status FROM daily_summary {where} ORDER BY name, date"
+        )
+        return pd.read_sql_query(query, self._connect(), params=params)
+
+    @staticmethod
+    def _filters(start_date, end_date, names):
+        """Builds the WHERE clause for the read filters; None if nothing can match."""
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append("date >= ?")
+            params.append(str(start_date))
+        if end_date is not None:
+            clauses.append("date <= ?")
+            params.append(str(end_date))
+        if names is not None:
+            names = list(names)
+            if not names:
+                return None, params
+            clauses.append(f"name IN ({', '.join('?' * len(names))})")
+            params.extend(names)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def date_bounds(self):
+        """
+        Returns the first and last dates with punches.
+
+        Returns:
+            tuple: The (min_date, max_date) strings, or None if there are no punches.
+        """
+        row = self._connect().execute("SELECT MIN(date), MAX(date) FROM punches").fetchone()
+        return None if row[0] is None else row
+
+    def names(self):
+        """
+        Returns everyone who has punched at least once.
+
+        Returns:
+            list: The sorted names.
+        """
+        return [row[0] for row in self._connect().execute("SELECT DISTINCT name FROM punches ORDER BY name")]
+
+    def version(self):
+        """
+        Returns a value that changes whenever punches are added, for use in cache keys.
+
+        Returns:
+            int: The highest punch id; punches are only ever appended.
+        """
+        return self._connect().execute("SELECT MAX(id) FROM punches").fetchone()[0]
+
+    def import_csv(self, csv_file):
+        """
+        Appends every punch from a CSV log.
+
+        Args:
+            csv_file (str): The CSV log to import.
+
+        Returns:
+            int: The number of punches imported.
+        """
+        df = pd.read_csv(csv_file, dtype=str)[LOG_COLUMNS]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO punches (name, date, time, status) VALUES (?, ?, ?, ?)",
+                df.itertuples(index=False, name=None),
+            )
+            # Only the days that received punches are rebuilt
+            for name, date_str in df[["Name", "Date"]].drop_duplicates().itertuples(index=False, name=None):
+                self._rebuild_day(conn, name, date_str)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(df)
+
+    def export_csv(self, csv_file):
+        """
+        Writes every punch to a CSV log in the usual format.
+
+        Args:
+            csv_file (str): The CSV file to write.
+        """
+        self.read().to_csv(csv_file, index=False)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_attendance_store():
+    """
+    Returns the process-wide attendance store selected by ATTENDANCE_BACKEND.
+
+    Returns:
+        CsvAttendanceStore or SqliteAttendanceStore: The shared store.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if ATTENDANCE_BACKEND == "sqlite":
+                _store = SqliteAttendanceStore()
+            else:
+                _store = CsvAttendanceStore(archive_dir=ATTENDANCE_ARCHIVE_DIR if ATTENDANCE_ARCHIVE else None)
+        return _store
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python attendance.py import|export [csv_file]
+    command = sys.argv[1] if len(sys.argv) > 1 else "import"
+    csv_file = sys.argv[2] if len(sys.argv) > 2 else LOG_FILE
+    db = SqliteAttendanceStore(import_from=None)
+    if command == "import":
+        print(f"Imported {db.import_csv(csv_file)} punches from {csv_file} into {ATTENDANCE_DB_FILE}")
+    elif command == "export":
+        db.export_csv(csv_file)
+        print(f"Exported {ATTENDANCE_DB_FILE} to {csv_file}")
+    else:
+        sys.exit(f"Unknown command: {command}")
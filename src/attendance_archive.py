@@ -0,0 +1,252 @@
+"""
+Monthly attendance archive for the Face Recognition Attendance System.
+
+Closed months of the CSV attendance log are rolled into one compressed `.npz`
+partition per month. Each partition stores its punches column by column
+(name ids, day of month, seconds since midnight, status ids) together with
+the daily summary of that month. A small JSON index records the date range,
+row count and people of every partition, so a query opens only the
+partitions that overlap its date range and people, and only the columns it
+needs.
+
+The index is replaced atomically after a partition is written, like the
+gallery header.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from config import ATTENDANCE_ARCHIVE_DIR
+
+ARCHIVE_FORMAT = "attendance-archive"
+ARCHIVE_FORMAT_VERSION = 1
+INDEX_FILE = "index.json"
+
+PUNCH_COLUMNS = ["Name", "Date", "Time", "Status"]
+SUMMARY_COLUMNS = ["Name", "Date", "WorkingSeconds", "FirstIn", "LastOut", "Status"]
+
+
+def _index_path(directory):
+    return os.path.join(directory, INDEX_FILE)
+
+
+def read_index(directory=ATTENDANCE_ARCHIVE_DIR):
+    """
+    Reads the partition index.
+
+    Args:
+        directory (str): The archive directory.
+
+    Returns:
+        dict: The index, or None if nothing has been archived in the directory.
+    """
+    path = _index_path(directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        index = json.load(f)
+    if index.get("format") != ARCHIVE_FORMAT or index.get("format_version") != ARCHIVE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported attendance archive format in {path}")
+    return index
+
+
+def _write_index(directory, partitions):
+    index = {
+        "format": ARCHIVE_FORMAT,
+        "format_version": ARCHIVE_FORMAT_VERSION,
+        "partitions": sorted(partitions, key=lambda partition: partition["month"]),
+    }
+    tmp_path = _index_path(directory) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, _index_path(directory))
+    return index
+
+
+def _clock_seconds(times):
+    parts = times.str.split(":", expand=True).astype(np.int32)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy(dtype=np.int32)
+
+
+def _optional_clock_seconds(times):
+    """Like `_clock_seconds`, with -1 for missing times."""
+    seconds = np.full(len(times), -1, dtype=np.int32)
+    present = times.notna().to_numpy()
+    if present.any():
+        seconds[present] = _clock_seconds(times[present])
+    return seconds
+
+
+def _clock_strings(seconds):
+    seconds = np.asarray(seconds, dtype=np.int64)
+    parts = [seconds // 3600, (seconds % 3600) // 60, seconds % 60]
+    hours, minutes, secs = (np.char.zfill(part.astype(str), 2) for part in parts)
+    return np.char.add(np.char.add(np.char.add(np.char.add(hours, ":"), minutes), ":"), secs)
+
+
+def _encode(values):
+    """Splits a string column into a sorted table and int32 ids into it."""
+    table, ids = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return table, ids.astype(np.int32)
+
+
+def save_partition(month, punches, summary, directory=ATTENDANCE_ARCHIVE_DIR):
+    """
+    Writes one month of punches and its daily summary as a partition.
+
+    Args:
+        month (str): The month, as YYYY-MM.
+        punches (pd.DataFrame): The month's punches, with "Name", "Date", "Time" and "Status", in log order.
+        summary (pd.DataFrame): The month's daily summary, with the SUMMARY_COLUMNS.
+        directory (str): The archive directory.
+
+    Returns:
+        dict: The index entry of the partition.
+    """
+    os.makedirs(directory, exist_ok=True)
+    names, name_ids = _encode(pd.concat([punches["Name"], summary["Name"]]))
+    statuses, status_ids = _encode(punches["Status"])
+    day_statuses, day_status_ids = _encode(summary["Status"])
+
+    file_name = f"punches.{month}.npz"
+    tmp_path = os.path.join(directory, file_name + ".tmp.npz")
+    np.savez_compressed(
+        tmp_path,
+        names=names,
+        statuses=statuses,
+        name_ids=name_ids[:len(punches)],
+        days=punches["Date"].str[8:10].astype(np.int8).to_numpy(),
+        times=_clock_seconds(punches["Time"]),
+        status_ids=status_ids.astype(np.int8),
+        summary_name_ids=name_ids[len(punches):],
+        summary_days=summary["Date"].str[8:10].astype(np.int8).to_numpy(),
+        summary_seconds=summary["WorkingSeconds"].to_numpy(dtype=np.float64),
+        summary_first_in=_optional_clock_seconds(summary["FirstIn"]),
+        summary_last_out=_optional_clock_seconds(summary["LastOut"]),
+        summary_statuses=day_statuses,
+        summary_status_ids=day_status_ids.astype(np.int8),
+    )
+    os.replace(tmp_path, os.path.join(directory, file_name))
+
+    entry = {
+        "month": month,
+        "file": file_name,
+        "rows": len(punches),
+        "min_date": punches["Date"].min(),
+        "max_date": punches["Date"].max(),
+        "names": sorted(set(punches["Name"])),
+    }
+    index = read_index(directory)
+    partitions = [p for p in (index["partitions"] if index else []) if p["month"] != month]
+    _write_index(directory, partitions + [entry])
+    return entry
+
+
+def _partitions(index, start_date, end_date, names):
+    """Yields the index entries that can hold rows matching the filters."""
+    for partition in (index or {}).get("partitions", []):
+        if start_date is not None and partition["max_date"] < str(start_date):
+            continue
+        if end_date is not None and partition["min_date"] > str(end_date):
+            continue
+        if names is not None and not set(partition["names"]).intersection(names):
+            continue
+        yield partition
+
+
+def _read(directory, index, start_date, end_date, names, prefix, build):
+    names = set(names) if names is not None else None
+    frames = []
+    for partition in _partitions(index, start_date, end_date, names):
+        # NpzFile decompresses an array only when it is accessed
+        with np.load(os.path.join(directory, partition["file"])) as npz:
+            days = npz[prefix + "days"]
+            mask = np.ones(len(days), dtype=bool)
+            if start_date is not None and str(start_date)[:7] == partition["month"]:
+                mask &= days >= int(str(start_date)[8:10])
+            if end_date is not None and str(end_date)[:7] == partition["month"]:
+                mask &= days <= int(str(end_date)[8:10])
+            if names is not None:
+                table = npz["names"]
+                wanted = np.flatnonzero(np.isin(table, list(names)))
+                mask &= np.isin(npz[prefix + "name_ids"], wanted)
+            if not mask.any():
+                continue
+            dates = np.char.add(partition["month"] + "-", np.char.zfill(days[mask].astype(str), 2))
+            frames.append(build(npz, mask, dates))
+    return frames
+
+
+def read_punches(start_date=None, end_date=None, names=None, directory=ATTENDANCE_ARCHIVE_DIR, index=None):
+    """
+    Reads archived punches, opening only the partitions that overlap the filters.
+
+    Args:
+        start_date (str, optional): The first date to include, as YYYY-MM-DD.
+        end_date (str, optional): The last date to include, as YYYY-MM-DD.
+        names (list, optional): The people to include.
+        directory (str): The archive directory.
+        index (dict, optional): The index, if it has already been read.
+
+    Returns:
+        pd.DataFrame: The punches with "Name", "Date", "Time" and "Status" columns, by month in log order.
+    """
+    index = index if index is not None else read_index(directory)
+
+    def build(npz, mask, dates):
+        return pd.DataFrame({
+            "Name": npz["names"][npz["name_ids"][mask]],
+            "Date": dates,
+            "Time": _clock_strings(npz["times"][mask]),
+            "Status": npz["statuses"][npz["status_ids"][mask]],
+        }, columns=PUNCH_COLUMNS).astype(str)
+
+    frames = _read(directory, index, start_date, end_date, names, "", build)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PUNCH_COLUMNS)
+
+
+def read_summary(start_date=None, end_date=None, names=None, directory=ATTENDANCE_ARCHIVE_DIR, index=None):
+    """
+    Reads the archived daily summary, opening only the partitions that overlap the filters.
+
+    Args:
+        start_date (str, optional): The first date to include, as YYYY-MM-DD.
+        end_date (str, optional): The last date to include, as YYYY-MM-DD.
+        names (list, optional): The people to include.
+        directory (str): The archive directory.
+        index (dict, optional): The index, if it has already been read.
+
+    Returns:
+        pd.DataFrame: One row per person and day with the SUMMARY_COLUMNS.
+    """
+    index = index if index is not None else read_index(directory)
+
+    def build(npz, mask, dates):
+        first_in, last_out = npz["summary_first_in"][mask], npz["summary_last_out"][mask]
+        return pd.DataFrame({
+            "Name": npz["names"][npz["summary_name_ids"][mask]].astype(object),
+            "Date": dates.astype(object),
+            # Stored as float64; the live summary counts whole seconds
+            "WorkingSeconds": npz["summary_seconds"][mask].astype(np.int64),
+            "FirstIn": np.where(first_in >= 0, _clock_strings(first_in).astype(object), None),
+            "LastOut": np.where(last_out >= 0, _clock_strings(last_out).astype(object), None),
+            "Status": npz["summary_statuses"][npz["summary_status_ids"][mask]].astype(object),
+        }, columns=SUMMARY_COLUMNS)
+
+    frames = _read(directory, index, start_date, end_date, names, "summary_", build)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+
+def archived_through(index):
+    """
+    Returns the last archived month.
+
+    Args:
+        index (dict): The partition index, or None.
+
+    Returns:
+        str: The month as YYYY-MM, or None if nothing is archived.
+    """
+    partitions = (index or {}).get("partitions", [])
+    return partitions[-1]["month"] if partitions else None
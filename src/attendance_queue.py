@@ -0,0 +1,214 @@
+"""
+Write-behind attendance queue for the Face Recognition Attendance System.
+
+Recognized punches are put on a bounded in-memory queue and committed to the
+attendance store by a background writer, in batches of up to
+ATTENDANCE_BATCH_SIZE punches or every ATTENDANCE_BATCH_INTERVAL_MS,
+whichever comes first. Recognition never waits on disk I/O; callers are told
+about each punch once it has been committed.
+"""
+
+import atexit
+import collections
+import threading
+import time
+from datetime import datetime
+from config import ATTENDANCE_QUEUE_SIZE, ATTENDANCE_BATCH_SIZE, ATTENDANCE_BATCH_INTERVAL_MS
+from attendance import get_attendance_store
+
+
+class AttendanceQueue:
+    """
+    Buffers punches and commits them to a store from a background thread.
+    """
+
+    def __init__(
+        self,
+        store,
+        max_size=ATTENDANCE_QUEUE_SIZE,
+        batch_size=ATTENDANCE_BATCH_SIZE,
+        batch_interval_ms=ATTENDANCE_BATCH_INTERVAL_MS,
+    ):
+        """
+        Initializes the AttendanceQueue and starts its writer thread.
+
+        Args:
+            store: The attendance store, with a `record_batch` method.
+            max_size (int): The number of punches that can wait before new ones are dropped.
+            batch_size (int): The largest number of punches committed together.
+            batch_interval_ms (float): How long the first punch of a batch may wait for others.
+        """
+        self.store = store
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval_ms / 1000.0
+        self._cond = threading.Condition()
+        self._events = collections.deque()
+        self._in_flight = 0
+        self._closed = False
+        self.dropped = 0
+        self.batches = 0
+        self.committed = 0
+        self.last_batch_size = 0
+        self.last_commit_latency = 0.0
+        self.total_commit_latency = 0.0
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, name, now=None, on_commit=None):
+        """
+        Queues a punch without waiting for it to be written.
+
+        Args:
+            name (str): The person's name.
+            now (datetime, optional): The time of the punch. Defaults to now.
+            on_commit (callable, optional): Called from the writer thread with the
+                committed record, with "Name", "Date", "Time" and "Status".
+
+        Returns:
+            bool: True if the punch was queued, False if the queue was full or closed.
+        """
+        with self._cond:
+            if self._closed or len(self._events) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._events.append((name, now or datetime.now(), on_commit))
+            self._cond.notify_all()
+            return True
+
+    @property
+    def depth(self):
+        """The number of punches waiting to be committed."""
+        with self._cond:
+            return len(self._events) + self._in_flight
+
+    def flush(self, timeout=5.0):
+        """
+        Waits until every queued punch has been committed.
+
+        Args:
+            timeout (float): The longest time to wait, in seconds.
+
+        Returns:
+            bool: True if the queue drained in time.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._events or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=5.0):
+        """
+        Commits the remaining punches and stops the writer thread.
+
+        Args:
+            timeout (float): The longest time to wait for the last batches, in seconds.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        """
+        Returns the writer's counters.
+
+        Returns:
+            dict: The queue "depth", the number of "committed" and "dropped" punches,
+            the number of "batches", the "last_batch_size", the "last_commit_ms" and
+            "avg_commit_ms" latencies, and the "last_error", if any.
+        """
+        with self._cond:
+            return {
+                "depth": len(self._events) + self._in_flight,
+                "committed": self.committed,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "last_batch_size": self.last_batch_size,
+                "last_commit_ms": self.last_commit_latency * 1000.0,
+                "avg_commit_ms": self.total_commit_latency * 1000.0 / self.batches if self.batches else 0.0,
+                "last_error": self.last_error,
+            }
+
+    def _next_batch(self):
+        """Waits for a full batch, the batch interval, or shutdown, and takes the batch."""
+        with self._cond:
+            while not self._events and not self._closed:
+                self._cond.wait()
+            deadline = time.monotonic() + self.batch_interval
+            while len(self._events) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+            self._in_flight = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                # Closed and drained
+                break
+
+            started = time.monotonic()
+            try:
+                records = self.store.record_batch([(name, now) for name, now, _ in batch])
+            except Exception as e:
+                with self._cond:
+                    self.last_error = str(e)
+                    self._in_flight = 0
+                    if self._closed:
+                        # Nothing will retry after shutdown; give up on this batch
+                        self.dropped += len(batch)
+                    else:
+                        # Put the batch back in front and retry after a pause
+                        self._events.extendleft(reversed(batch))
+                    self._cond.notify_all()
+                time.sleep(self.batch_interval)
+                continue
+
+            latency = time.monotonic() - started
+            with self._cond:
+                self._in_flight = 0
+                self.batches += 1
+                self.committed += len(records)
+                self.last_batch_size = len(records)
+                self.last_commit_latency = latency
+                self.total_commit_latency += latency
+                self.last_error = None
+                self._cond.notify_all()
+
+            for (_, _, on_commit), record in zip(batch, records):
+                if on_commit is not None:
+                    try:
+                        on_commit(record)
+                    except Exception:
+                        pass
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_attendance_queue():
+    """
+    Returns the process-wide attendance queue, writing to the shared attendance store.
+
+    The queue is flushed when the process exits.
+
+    Returns:
+        AttendanceQueue: The shared queue.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = AttendanceQueue(get_attendance_store())
+            atexit.register(_queue.close)
+        return _queue
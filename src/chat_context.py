@@ -0,0 +1,254 @@
+"""
+Attendance context for the chatbot.
+
+Instead of the raw attendance log, the chatbot gets a compact summary built
+from the daily summary of the attendance store: per-employee totals, the
+days and punches of the people and dates the question mentions, and
+anomalies such as missing punch-outs. Sections are added in order of
+importance until the token budget is spent, and built contexts are cached
+until the log changes.
+"""
+
+import calendar
+import collections
+import re
+import threading
+from datetime import date, timedelta
+from config import CHATBOT_CONTEXT_TOKENS, CHATBOT_CONTEXT_DAYS, CHATBOT_RECENT_PUNCHES
+from attendance import get_attendance_store
+
+CHARS_PER_TOKEN = 4  # A conservative average for English text and numbers
+
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_MONTH = re.compile(
+    r"\b(" + "|".join(name.lower() for name in calendar.month_name if name) + r")\b(?:\s+(\d{4}))?"
+)
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a text without a tokenizer.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def mentioned_names(question, names):
+    """
+    Finds the known people named in a question.
+
+    Args:
+        question (str): The user's question.
+        names (list): Everyone in the attendance log.
+
+    Returns:
+        list: The names mentioned, matched case-insensitively as whole words.
+    """
+    text = question.lower()
+    return [name for name in names if re.search(r"\b" + re.escape(name.lower()) + r"\b", text)]
+
+
+def mentioned_dates(question, today):
+    """
+    Finds the date range a question asks about.
+
+    Understands ISO dates, "today", "yesterday", "this/last week",
+    "this/last month" and month names, optionally followed by a year.
+
+    Args:
+        question (str): The user's question.
+        today (date): The current date.
+
+    Returns:
+        tuple: The (start, end) dates covering every mention, or None if there is none.
+    """
+    text = question.lower()
+    ranges = []
+
+    for year, month, day in _ISO_DATE.findall(text):
+        try:
+            day = date(int(year), int(month), int(day))
+        except ValueError:
+            continue
+        ranges.append((day, day))
+
+    if "today" in text:
+        ranges.append((today, today))
+    if "yesterday" in text:
+        ranges.append((today - timedelta(days=1), today - timedelta(days=1)))
+
+    monday = today - timedelta(days=today.weekday())
+    if "this week" in text:
+        ranges.append((monday, today))
+    if "last week" in text:
+        ranges.append((monday - timedelta(days=7), monday - timedelta(days=1)))
+
+    first = today.replace(day=1)
+    if "this month" in text:
+        ranges.append((first, today))
+    if "last month" in text:
+        previous = (first - timedelta(days=1)).replace(day=1)
+        ranges.append((previous, first - timedelta(days=1)))
+
+    for match in _MONTH.finditer(text):
+        month = list(calendar.month_name).index(match.group(1).capitalize())
+        # "may" is usually the verb unless a year follows it
+        if month == 5 and not match.group(2):
+            continue
+        # Without a year, take the latest such month that has started
+        year = int(match.group(2)) if match.group(2) else today.year - (month > today.month)
+        ranges.append((date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])))
+
+    if not ranges:
+        return None
+    return min(start for start, _ in ranges), max(end for _, end in ranges)
+
+
+class AttendanceContextBuilder:
+    """
+    Builds token-budgeted attendance summaries for the chatbot, cached per log version.
+    """
+
+    def __init__(
+        self,
+        store,
+        token_budget=CHATBOT_CONTEXT_TOKENS,
+        default_days=CHATBOT_CONTEXT_DAYS,
+        recent_punches=CHATBOT_RECENT_PUNCHES,
+        cache_size=32,
+    ):
+        """
+        Initializes the AttendanceContextBuilder.
+
+        Args:
+            store: The attendance store.
+            token_budget (int): The largest context to build, in estimated tokens.
+            default_days (int): The number of days summarized when the question names no dates.
+            recent_punches (int): The number of most recent punches to list.
+            cache_size (int): The number of contexts kept for the current log version.
+        """
+        self.store = store
+        self.token_budget = token_budget
+        self.default_days = default_days
+        self.recent_punches = recent_punches
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._version = None
+
+    def build(self, question, today=None):
+        """
+        Builds the attendance context for a question.
+
+        Args:
+            question (str): The user's question.
+            today (date, optional): The current date. Defaults to today.
+
+        Returns:
+            str: The context, at most `token_budget` estimated tokens long.
+        """
+        today = today or date.today()
+        names = mentioned_names(question, self.store.names())
+        start, end = mentioned_dates(question, today) or (today - timedelta(days=self.default_days - 1), today)
+        key = (tuple(names), start, end, today)
+
+        version = self.store.version()
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        context = self._render(names, start, end, today)
+        with self._lock:
+            if version == self._version:
+                self._cache[key] = context
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return context
+
+    def _render(self, names, start, end, today):
+        summary = self.store.read_summary(start.isoformat(), end.isoformat(), names or None)
+        scope = f"for {', '.join(names)} " if names else ""
+        if summary.empty:
+            return f"No attendance records {scope}from {start} to {end} (today is {today})."
+
+        hours = summary["WorkingSeconds"].astype(float) / 3600
+        # Missing punch times may come back as NaN depending on the store
+        summary = summary.astype(object).where(summary.notna(), None)
+        sections = [[
+            f"Attendance summary {scope}from {start} to {end} (today is {today}). "
+            f"{summary['Name'].nunique()} people, {len(summary)} person-days."
+        ]]
+
+        per_person = ["Per person: days punched, full/half/absent days, total and average hours:"]
+        for name, days in summary.assign(Hours=hours).groupby("Name"):
+            counts = days["Status"].value_counts()
+            per_person.append(
+                f"- {name}: {len(days)} days, {counts.get('Full Day', 0)}/{counts.get('Half Day', 0)}/"
+                f"{counts.get('Absent', 0)}, {days['Hours'].sum():.1f} h, {days['Hours'].mean():.1f} h/day"
+            )
+        sections.append(per_person)
+
+        anomalies = ["Anomalies:"]
+        for row in summary.itertuples(index=False):
+            if row.FirstIn and not row.LastOut and row.Date < today.isoformat():
+                anomalies.append(f"- {row.Date} {row.Name}: punched in at {row.FirstIn} but never out")
+        if len(anomalies) > 1:
+            sections.append(anomalies)
+
+        daily = ["Days, newest first (name, first in, last out, hours, status):"]
+        for row, day_hours in sorted(zip(summary.itertuples(index=False), hours), key=lambda r: r[0].Date, reverse=True):
+            daily.append(
+                f"- {row.Date} {row.Name}: in {row.FirstIn or '-'}, out {row.LastOut or '-'}, "
+                f"{day_hours:.2f} h, {row.Status}"
+            )
+        sections.append(daily)
+
+        punches = self.store.read(start.isoformat(), end.isoformat(), names or None).tail(self.recent_punches)
+        if not punches.empty:
+            recent = ["Most recent punches:"]
+            recent += [f"- {row.Date} {row.Time} {row.Name} {row.Status}" for row in punches[::-1].itertuples(index=False)]
+            sections.append(recent)
+
+        return self._fit(sections)
+
+    def _fit(self, sections):
+        """Joins the sections in order, cutting off lines once the token budget is spent."""
+        lines, used = [], 0
+        for section in sections:
+            for i, line in enumerate(section):
+                cost = estimate_tokens(line + "\n")
+                if used + cost > self.token_budget:
+                    if i > 0:
+                        note = f"- ... {len(section) - i} more not shown"
+                        if used + estimate_tokens(note + "\n") <= self.token_budget:
+                            lines.append(note)
+                    return "\n".join(lines)
+                lines.append(line)
+                used += cost
+        return "\n".join(lines)
+
+
+_builder = None
+_builder_lock = threading.Lock()
+
+def get_context_builder():
+    """
+    Returns the process-wide context builder for the shared attendance store.
+
+    Returns:
+        AttendanceContextBuilder: The shared builder.
+    """
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            _builder = AttendanceContextBuilder(get_attendance_store())
+        return _builder
@@ -2,41 +2,429 @@
 Chatbot service for the Streamlit application.
 
 This module contains the `AttendanceChatbot` class, which is responsible
-for interacting with the Groq API to provide a chat interface.
+for interacting with the Groq API to provide a chat interface, the Groq
+client shared by every chat session, the process-wide cache of its
+responses, and the router that answers structured attendance questions
+without the model.
 """
 
 from groq import Groq
+import collections
 import os
+import re
+import threading
+import time
 import streamlit as st
 from dotenv import load_dotenv
-from datetime import datetime
-from config import CHATBOT_MODEL
+from datetime import datetime, date, timedelta
+from config import CHATBOT_MODEL, CHATBOT_CACHE_SIZE, CHATBOT_CACHE_TTL, CHATBOT_TIMEOUT, WORKING_DAYS
+from attendance import get_attendance_store
+from chat_context import mentioned_names, mentioned_dates
+from dataset_catalog import get_dataset_catalog
+
+
+def normalize_prompt(prompt):
+    """
+    Normalizes a prompt so trivially different phrasings share a cache entry.
+
+    Args:
+        prompt (str): The user's input.
+
+    Returns:
+        str: The prompt in lower case, with collapsed whitespace and no trailing punctuation.
+    """
+    return re.sub(r"\s+", " ", prompt).strip().rstrip("?!. ").lower()
+
+
+class ResponseCache:
+    """
+    An LRU cache of chatbot responses with a time-to-live.
+
+    Keys include the attendance data version, so answers about attendance
+    are dropped as soon as new punches land; answers that did not depend on
+    attendance data only expire with their TTL.
+    """
+
+    def __init__(self, max_entries=CHATBOT_CACHE_SIZE, ttl=CHATBOT_CACHE_TTL):
+        """
+        Initializes the ResponseCache.
+
+        Args:
+            max_entries (int): The number of responses kept.
+            ttl (float): How long a response stays valid, in seconds.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._data_version = None
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _invalidate(self, data_version):
+        """Drops every entry that depended on an older attendance data version."""
+        if data_version is None or data_version == self._data_version:
+            return
+        self._data_version = data_version
+        for key in [key for key in self._entries if key[-1] is not None and key[-1] != data_version]:
+            del self._entries[key]
+
+    def get(self, key):
+        """
+        Looks up a response.
+
+        Args:
+            key (tuple): The cache key, ending with the attendance data version or None.
+
+        Returns:
+            str: The cached response, or None on a miss.
+        """
+        with self._lock:
+            self._invalidate(key[-1])
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[1]
+
+    def put(self, key, response, latency):
+        """
+        Stores a response.
+
+        Args:
+            key (tuple): The cache key, ending with the attendance data version or None.
+            response (str): The response.
+            latency (float): How long the response took to produce, in seconds.
+        """
+        with self._lock:
+            self._invalidate(key[-1])
+            self._entries[key] = (time.monotonic() + self.ttl, response, latency)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The number of "entries", "hits" and "misses", the "hit_rate"
+            and the model latency saved by hits, in "saved_seconds".
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """
+    Returns the response cache shared by every chat session in the process.
+
+    Returns:
+        ResponseCache: The shared cache.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+_PUNCH_TIME = re.compile(
+    r"\b(?:when|what time)\b.*\b(?:(?:punch|clock|check|sign)(?:ed)?[ -]?(in|out)|"
+    r"(arrive|arrived|come in|came in)|(leave|left|go home|went home))\b"
+)
+_DAY_STATUS = re.compile(r"\bwho\b.*\b(full[ -]day|half[ -]day|absent)\b")
+_PRESENT = re.compile(r"\bwho\b.*\b(?:present|punched in|clocked in|came in|showed up|attended)\b")
+_HOURS = re.compile(r"\bhours?\b")
+_WORKED = re.compile(r"\b(?:work|worked|working|spend|spent)\b")
+# Qualifiers none of the intents can answer, e.g. "who came in late today"
+_UNSUPPORTED = re.compile(r"\b(?:late|later|early|earlier|before|after|most|least)\b")
+
+
+def _day_range(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def _period(start, end):
+    return f"on {start}" if start == end else f"from {start} to {end}"
+
+
+class AttendanceQueryRouter:
+    """
+    Answers structured attendance questions directly from the attendance store.
+
+    A question is matched against a few intents (punch times, hours worked,
+    who had a full or half day or was absent, who was present) and their
+    slots, the people and dates asked about, are filled with the chat context
+    helpers. Questions that match no intent, or miss a slot, are left to the
+    model.
+
+    Absence is only answered against a roster of the enrolled people, since
+    the attendance log knows nothing of people who never punched in.
+    """
+
+    def __init__(self, store, max_days=31, roster=None):
+        """
+        Initializes the AttendanceQueryRouter.
+
+        Args:
+            store: The attendance store.
+            max_days (int): The longest date range answered day by day; longer ones go to the model.
+            roster (callable, optional): Returns the enrolled people. Without it, or when it
+                returns no one, questions about absence go to the model.
+        """
+        self.store = store
+        self.max_days = max_days
+        self.roster = roster
+
+    def route(self, question, today=None):
+        """
+        Recognizes the intent of a question and fills its slots.
+
+        Args:
+            question (str): The user's question.
+            today (date, optional): The current date. Defaults to today.
+
+        Returns:
+            tuple: The (intent, detail, names, start, end) of the question, or None if
+            it is not a structured lookup. `detail` is "in"/"out" for "punch_time" and
+            the day status for "day_status".
+        """
+        today = today or date.today()
+        text = re.sub(r"\s+", " ", question.lower())
+        if _UNSUPPORTED.search(text):
+            return None
+        dates = mentioned_dates(text, today)
+        start, end = dates or (today, today)
+        if (end - start).days >= self.max_days:
+            return None
+
+        match = _PUNCH_TIME.search(text)
+        if match:
+            names = mentioned_names(text, self.store.names())
+            if not names:
+                return None
+            direction = "in" if match.group(2) else "out" if match.group(3) else match.group(1)
+            return "punch_time", direction, names, start, end
+
+        match = _DAY_STATUS.search(text)
+        if match and start <= today:
+            status = {"f": "Full Day", "h": "Half Day", "a": "Absent"}[match.group(1)[0]]
+            if status == "Absent" and not self._enrolled():
+                return None
+            return "day_status", status, None, start, end
+
+        if _PRESENT.search(text):
+            return "present", None, None, start, end
+
+        # "Hours" alone is too vague ("office hours today"), so the question must be
+        # about someone's work and name a period
+        if _HOURS.search(text) and _WORKED.search(text) and dates:
+            names = mentioned_names(text, self.store.names())
+            if not names:
+                return None
+            return "hours", None, names, start, end
+
+        return None
+
+    def _enrolled(self):
+        """Returns the enrolled people, or an empty list if there is no roster."""
+        return list(self.roster()) if self.roster is not None else []
+
+    def answer(self, question, today=None):
+        """
+        Answers a structured attendance question.
+
+        Args:
+            question (str): The user's question.
+            today (date, optional): The current date. Defaults to today.
+
+        Returns:
+            str: The answer, or None if the question should go to the model.
+        """
+        today = today or date.today()
+        route = self.route(question, today)
+        if route is None:
+            return None
+        intent, detail, names, start, end = route
+
+        summary = self.store.read_summary(start.isoformat(), end.isoformat(), names)
+        # Missing punch times may come back as NaN depending on the store
+        summary = summary.astype(object).where(summary.notna(), None)
+
+        if intent == "punch_time":
+            return self._punch_time(summary, detail, names, start, end)
+        if intent == "day_status":
+            return self._day_status(summary, detail, start, min(end, today), today)
+        if intent == "present":
+            return self._present(summary, start, end)
+        return self._hours(summary, names, start, end)
+
+    def _punch_time(self, summary, direction, names, start, end):
+        column, label = ("FirstIn", "first punch-in") if direction == "in" else ("LastOut", "last punch-out")
+        lines = []
+        for name in names:
+            days = summary[(summary["Name"] == name) & summary[column].notna()].sort_values("Date")
+            if days.empty:
+                lines.append(f"{name} has no punch-{direction} {_period(start, end)}.")
+            elif start == end:
+                lines.append(f"{name}'s {label} on {start} was at {days[column].iloc[0]}.")
+            else:
+                lines.append(f"{name}'s {label} {_period(start, end)}:")
+                lines += [f"- {row.Date}: {getattr(row, column)}" for row in days.itertuples(index=False)]
+        return "\n".join(lines)
+
+    def _day_status(self, summary, status, start, end, today):
+        label = status.lower()
+        enrolled = self._enrolled() if status == "Absent" else []
+        lines = []
+        for day in _day_range(start, end):
+            rows = summary[summary["Date"] == day.isoformat()]
+            if status == "Absent":
+                if day.strftime("%A") not in WORKING_DAYS:
+                    continue
+                if day == today:
+                    # Today's hours are still adding up; anyone who punched in is at work
+                    present = set(rows.loc[rows["FirstIn"].notna(), "Name"])
+                else:
+                    present = set(rows.loc[rows["Status"] != "Absent", "Name"])
+                # Enrolled people without a single punch that day were absent too
+                people = [name for name in enrolled if name not in present]
+            else:
+                people = list(rows.loc[rows["Status"] == status, "Name"])
+            if people:
+                lines.append(f"- {day}: {', '.join(sorted(people))}")
+
+        if not lines:
+            return f"No one was {label} {_period(start, end)}." if status == "Absent" else f"No one had a {label} {_period(start, end)}."
+        if start == end:
+            return f"{label.capitalize()} on {start}: {lines[0].split(': ', 1)[1]}."
+        return "\n".join([f"{label.capitalize()} {_period(start, end)}:"] + lines)
+
+    def _present(self, summary, start, end):
+        punched_in = summary[summary["FirstIn"].notna()]
+        if start == end:
+            people = ", ".join(sorted(punched_in["Name"])) or "no one"
+            return f"Punched in on {start}: {people}."
+        lines = [f"Punched in {_period(start, end)}:"]
+        for day, rows in punched_in.groupby("Date"):
+            lines.append(f"- {day}: {', '.join(sorted(rows['Name']))}")
+        return "\n".join(lines) if len(lines) > 1 else f"No one punched in {_period(start, end)}."
+
+    def _hours(self, summary, names, start, end):
+        hours = summary.assign(Hours=summary["WorkingSeconds"].astype(float) / 3600).groupby("Name")["Hours"]
+        totals, days = hours.sum(), hours.size()
+        lines = []
+        for name in names:
+            if name not in totals.index:
+                lines.append(f"{name} has no attendance records {_period(start, end)}.")
+            else:
+                count = days[name]
+                lines.append(
+                    f"{name} worked {totals[name]:.1f} hours {_period(start, end)} "
+                    f"({count} day{'s' if count != 1 else ''} with punches)."
+                )
+        return "\n".join(lines)
+
+
+_query_router = None
+_query_router_lock = threading.Lock()
+
+def get_query_router():
+    """
+    Returns the process-wide query router for the shared attendance store,
+    with the people in the dataset as its roster.
+
+    Returns:
+        AttendanceQueryRouter: The shared router.
+    """
+    global _query_router
+    with _query_router_lock:
+        if _query_router is None:
+            _query_router = AttendanceQueryRouter(get_attendance_store(), roster=get_dataset_catalog().people)
+        return _query_router
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_chat_client(api_key, timeout=CHATBOT_TIMEOUT):
+    """
+    Returns the Groq client shared by every chat session in the process.
+
+    The client keeps its HTTP connections open between requests, so only the
+    first question pays for connecting to the API. Set GROQ_BASE_URL to use
+    another OpenAI-compatible server, e.g. a local fake.
+
+    Args:
+        api_key (str): The Groq API key.
+        timeout (float): The default request timeout, in seconds.
+
+    Returns:
+        Groq: The shared client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None or _client.api_key != api_key:
+            _client = Groq(api_key=api_key, timeout=timeout, max_retries=1)
+        return _client
 
 
 class AttendanceChatbot:
     """
     A class to represent the attendance chatbot.
     """
-    def __init__(self):
+    def __init__(self, client=None, cache=None, timeout=CHATBOT_TIMEOUT, router=None):
         """
         Initializes the AttendanceChatbot.
+
+        Args:
+            client (optional): A client with the Groq `chat.completions.create` interface,
+                e.g. a local stub. Defaults to the shared Groq client for GROQ_API_KEY.
+            cache (ResponseCache, optional): The response cache. Defaults to the process-wide cache.
+            timeout (float): How long to wait for the API to connect or send the next chunk, in seconds.
+            router (AttendanceQueryRouter, optional): Answers structured attendance questions
+                without the model. Defaults to the process-wide router.
         """
-        # 1. Load environment variables from .env file (for local development)
-        load_dotenv()
-        
-        # 2. Get API key from st.secrets (Streamlit Cloud) or environment variables (local)
-        api_key = self._get_api_key()
-        
-        # 3. Validate the API key
-        if not api_key:
-            raise ValueError(
-                "GROQ_API_KEY not found. "
-                "For local development: Create a .env file with GROQ_API_KEY=your_api_key_here\n"
-                "For Streamlit Cloud: Add GROQ_API_KEY in the app's Secrets section"
-            )
-        
-        # 4. Initialize Groq client
-        self.client = Groq(api_key=api_key)
+        if client is None:
+            # 1. Load environment variables from .env file (for local development)
+            load_dotenv()
+            
+            # 2. Get API key from st.secrets (Streamlit Cloud) or environment variables (local)
+            api_key = self._get_api_key()
+            
+            # 3. Validate the API key
+            if not api_key:
+                raise ValueError(
+                    "GROQ_API_KEY not found. "
+                    "For local development: Create a .env file with GROQ_API_KEY=your_api_key_here\n"
+                    "For Streamlit Cloud: Add GROQ_API_KEY in the app's Secrets section"
+                )
+            
+            # 4. Reuse the process-wide Groq client and its connections
+            client = get_chat_client(api_key)
+        self.client = client
+        self.cache = cache if cache is not None else get_response_cache()
+        self.timeout = timeout
+        self.router = router if router is not None else get_query_router()
+        self.model = "llama-3.1-8b-instant"
+        self.temperature = 0.7
+        self.max_tokens = 150
         
         # 5. Set up chatbot context
         self.context = f"""
@@ -62,37 +450,121 @@ class AttendanceChatbot:
         # Fallback to environment variables (for local development)
         return os.getenv("GROQ_API_KEY")
 
-    def get_response(self, user_input, attendance_data=None):
+    def answer_locally(self, user_input, role=None):
         """
-        Gets a response from the chatbot.
+        Answers a structured attendance question from the attendance store, without the model.
 
         Args:
             user_input (str): The user's input.
-            attendance_data (str, optional): The attendance data to provide to the chatbot. Defaults to None.
+            role (str, optional): The role of the user asking. Only admins may see attendance data.
 
         Returns:
-            str: The chatbot's response.
+            str: The answer, or None if the question should go to the model.
         """
+        if role != "admin":
+            return None
         try:
-            # Prepare messages
-            messages = [
-                {"role": "system", "content": self.context},
-                {"role": "user", "content": user_input}
-            ]
-            
-            # Add attendance data if available (for admins)
-            if attendance_data:
-                messages.insert(1, {"role": "system", "content": f"Attendance data:\n{attendance_data}"})
-
-            # Get response from Groq API
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=150
+            return self.router.answer(user_input)
+        except Exception:
+            # A failed lookup is no worse than asking the model
+            return None
+
+    def _cache_key(self, user_input, attendance_data, role, data_version):
+        if attendance_data and data_version is None:
+            # Without a version, the data itself decides whether an answer is still valid
+            data_version = hash(attendance_data)
+        return (
+            normalize_prompt(user_input), role, self.model, self.temperature, self.max_tokens,
+            self.context, data_version,
+        )
+
+    def _messages(self, user_input, attendance_data):
+        messages = [
+            {"role": "system", "content": self.context},
+            {"role": "user", "content": user_input}
+        ]
+
+        # Add attendance data if available (for admins)
+        if attendance_data:
+            messages.insert(1, {"role": "system", "content": f"Attendance data:\n{attendance_data}"})
+        return messages
+
+    def stream_response(self, user_input, attendance_data=None, role=None, data_version=None, cancel=None):
+        """
+        Streams a response from the chatbot as it is generated.
+
+        The response is cached once the model has finished it; a cached response
+        is yielded as a single chunk. Closing the generator, or setting `cancel`,
+        stops the request and closes its connection.
+
+        Args:
+            user_input (str): The user's input.
+            attendance_data (str, optional): The attendance data to provide to the chatbot. Defaults to None.
+            role (str, optional): The role of the user asking, part of the cache key.
+            data_version (optional): The version of the attendance data, e.g. from the
+                attendance store. Cached answers are dropped when it changes.
+            cancel (threading.Event, optional): Stops the response when set.
+
+        Yields:
+            str: The next piece of the response.
+        """
+        key = self._cache_key(user_input, attendance_data, role, data_version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        started = time.monotonic()
+        chunks = []
+        finished = False
+        stream = None
+        try:
+            # Get response from Groq API, token by token
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(user_input, attendance_data),
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True,
+                timeout=self.timeout,
             )
-            
-            return response.choices[0].message.content
-            
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    return
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    chunks.append(text)
+                    yield text
+                finished = finished or chunk.choices[0].finish_reason is not None
+
         except Exception as e:
-            return f"Sorry, I encountered an error: {str(e)}"
+            yield f"Sorry, I encountered an error: {str(e)}"
+            return
+
+        finally:
+            # Release the connection even when the reader stopped early
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+        # A stream cut off before the model finished is not a complete answer
+        if finished:
+            self.cache.put(key, "".join(chunks), time.monotonic() - started)
+
+    def get_response(self, user_input, attendance_data=None, role=None, data_version=None):
+        """
+        Gets a response from the chatbot.
+
+        Args:
+            user_input (str): The user's input.
+            attendance_data (str, optional): The attendance data to provide to the chatbot. Defaults to None.
+            role (str, optional): The role of the user asking, part of the cache key.
+            data_version (optional): The version of the attendance data, e.g. from the
+                attendance store. Cached answers are dropped when it changes.
+
+        Returns:
+            str: The chatbot's response.
+        """
+        return "".join(self.stream_response(user_input, attendance_data, role=role, data_version=data_version))
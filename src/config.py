@@ -13,15 +13,65 @@ ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATASET_DIR = os.path.join(ROOT_DIR, "dataset")
 
 # --- File Paths ---
-ENCODINGS_FILE = os.path.join(ROOT_DIR, "encodings.pickle")
+GALLERY_DIR = os.path.join(ROOT_DIR, "gallery")  # Memory-mapped encodings written by encode_faces.py
+ENCODINGS_FILE = os.path.join(ROOT_DIR, "encodings.pickle")  # Legacy format, converted on first load
+ENCODINGS_MANIFEST_FILE = os.path.join(GALLERY_DIR, "manifest.pickle")
+ANN_INDEX_FILE = os.path.join(GALLERY_DIR, "ivf_index.npz")
+GALLERY_POLL_SECONDS = 2.0  # How often running streams check the gallery for a new generation
 LOG_FILE = os.path.join(ROOT_DIR, "attendance_log.csv")
+ATTENDANCE_DB_FILE = os.path.join(ROOT_DIR, "attendance.db")
+ATTENDANCE_ARCHIVE_DIR = os.path.join(ROOT_DIR, "attendance_archive")  # Monthly partitions of the CSV log
 SHAPE_PREDICTOR_FILE = os.path.join(ROOT_DIR, "shape_predictor_68_face_landmarks.dat")
+DATASET_CATALOG_FILE = os.path.join(ROOT_DIR, "dataset_catalog.json")  # Per-person image counts, sizes, hashes and faces
+THUMBNAIL_DIR = os.path.join(ROOT_DIR, "thumbnails")  # Small previews of the dataset images
 
 # --- Face Recognition Parameters ---
 MIN_FACE_SIZE = 100  # Minimum face size to detect (in pixels)
-PROCESS_EVERY_N_FRAMES = 5  # Process every Nth frame to save resources
 DOWNSAMPLE_FACTOR = 0.5  # Downsample factor for faster processing
 MIN_TIME_BETWEEN_RECORDS = 60  # Cooldown in seconds between records for the same person
+PUNCH_COOLDOWN_BACKEND = "memory"  # "memory" shares the cooldown within the process, "sqlite" across processes
+FACE_MATCH_TOLERANCE = 0.6  # Maximum face distance that still counts as a match
+
+# --- Recognition Scheduling ---
+RECOGNITION_MAX_RATE = 4  # Maximum recognition passes per second per stream
+RECOGNITION_CPU_BUDGET = 0.4  # Maximum fraction of one core spent on recognition per stream
+RECOGNITION_IDLE_AFTER = 5  # Seconds without a face before backing off
+RECOGNITION_IDLE_MAX_INTERVAL = 2.0  # Longest gap in seconds between passes while idle
+
+# --- Pre-Detection Gate ---
+GATE_ENABLED = True  # Skip detection on frames with no motion or poor quality
+GATE_WIDTH = 160  # Width in pixels the frame is shrunk to before gating
+GATE_PIXEL_DIFF = 25  # Intensity change that counts a pixel as moving
+GATE_MOTION_THRESHOLD = 0.01  # Fraction of moving pixels needed to run detection
+GATE_BACKGROUND_RATE = 0.05  # How fast the background model adapts to the scene
+GATE_MIN_SHARPNESS = 20.0  # Minimum variance of the Laplacian (blur check)
+GATE_MIN_BRIGHTNESS = 40  # Minimum mean brightness (0-255)
+GATE_MAX_BRIGHTNESS = 220  # Maximum mean brightness (0-255)
+
+# --- Face Tracking Parameters ---
+TRACK_IOU_THRESHOLD = 0.3  # Minimum box overlap for a detection to continue a track
+TRACK_MAX_MISSES = 2  # Detection passes a track survives without being seen
+TRACK_MAX_GATED_PASSES = 5  # Gated passes in a row that count as one detection pass without faces
+TRACK_REVERIFY_SECONDS = 10  # How often a known track is re-encoded to confirm its identity
+TRACK_USE_OPTICAL_FLOW = True  # Move boxes with optical flow between detection passes
+
+# --- Gallery Compression ---
+COMPRESS_GALLERY = False  # Store per-identity prototypes alongside the raw encodings
+PROTOTYPES_PER_IDENTITY = 3  # Number of medoids kept per identity, besides the centroid
+
+# --- Approximate Nearest-Neighbour Index ---
+USE_ANN_INDEX = False  # Build and use an IVF index instead of the exact scan
+ANN_MIN_GALLERY_SIZE = 2000  # Below this many encodings the exact scan is used anyway
+ANN_NUM_LISTS = 0  # Number of k-means lists (0 = sqrt of the gallery size)
+ANN_NUM_PROBES = 8  # Number of lists scanned per query
+
+# --- Enrollment Encoding ---
+ENCODING_WORKERS = 0  # Worker processes used to encode the dataset (0 = all cores, 1 = serial)
+ENCODING_CHUNK_SIZE = 4  # Images handed to a worker process at a time
+ENROLLMENT_STATUS_REFRESH = 1.0  # Seconds between dashboard updates while a face model update runs
+
+# --- Dataset Catalog ---
+THUMBNAIL_SIZE = 128  # Longest side of an image thumbnail, in pixels
 
 # --- Liveness Detection Parameters ---
 EYE_AR_THRESH = 0.2  # Threshold for eye aspect ratio to detect a blink
@@ -30,9 +80,22 @@ EYE_AR_THRESH = 0.2  # Threshold for eye aspect ratio to detect a blink
 REQUIRED_HOURS_FULL_DAY = 8.5  # 8 hours 30 minutes
 REQUIRED_HOURS_HALF_DAY = 4.25  # 4 hours 15 minutes
 WORKING_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+ATTENDANCE_BACKEND = "csv"  # "csv" for the flat log, "sqlite" for the indexed database
+ATTENDANCE_ARCHIVE = False  # Roll closed months of the CSV log into compressed monthly partitions
+ATTENDANCE_TAIL_BLOCK_SIZE = 64 * 1024  # Bytes read per step when rebuilding today's punch state from the log
+ATTENDANCE_DURABILITY = "normal"  # "full" syncs every committed batch to disk, "normal" leaves it to the OS
+ATTENDANCE_QUEUE_SIZE = 1000  # Punches that can wait for the background writer before new ones are dropped
+ATTENDANCE_BATCH_SIZE = 50  # Punches committed together at most
+ATTENDANCE_BATCH_INTERVAL_MS = 200  # How long the first punch of a batch may wait for others
 
 # --- Chatbot Configuration ---
 CHATBOT_MODEL = "llama3-8b-8192"
+CHATBOT_CONTEXT_TOKENS = 1500  # Budget for the attendance summary sent with an admin's question
+CHATBOT_CONTEXT_DAYS = 30  # Days summarized when the question names no dates
+CHATBOT_RECENT_PUNCHES = 20  # Most recent punches listed in the context
+CHATBOT_CACHE_SIZE = 256  # Chatbot responses kept for repeated questions
+CHATBOT_CACHE_TTL = 600  # Seconds a cached chatbot response stays valid
+CHATBOT_TIMEOUT = 20  # Seconds to wait for the chatbot API to connect or send the next chunk
 
 # --- Authentication (for demonstration purposes) ---
 # In a real application, use a secure way to store user data
@@ -0,0 +1,167 @@
+"""
+Punch cooldown for the Face Recognition Attendance System.
+
+Once a person has been punched, further recognitions of them are ignored for
+MIN_TIME_BETWEEN_RECORDS seconds. The cooldown is shared by every stream in
+the process, so two sessions or two cameras at the same door punch a person
+once. With the SQLite backend it is also shared between processes.
+"""
+
+import collections
+import os
+import sqlite3
+import threading
+import time
+from config import MIN_TIME_BETWEEN_RECORDS, PUNCH_COOLDOWN_BACKEND, ATTENDANCE_DB_FILE
+
+
+class CooldownCache:
+    """
+    An in-process cooldown keyed by identity, with expired entries evicted.
+    """
+
+    def __init__(self, ttl=MIN_TIME_BETWEEN_RECORDS):
+        """
+        Initializes the CooldownCache.
+
+        Args:
+            ttl (float): How long a person stays in cooldown after a punch, in seconds.
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Ordered by punch time, so the expired entries are always at the front
+        self._punched_at = collections.OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._punched_at)
+
+    def _evict(self, now):
+        while self._punched_at:
+            name, punched_at = next(iter(self._punched_at.items()))
+            if now - punched_at < self.ttl:
+                break
+            del self._punched_at[name]
+
+    def acquire(self, name, now=None):
+        """
+        Starts the cooldown of a person unless it is already running.
+
+        Args:
+            name (str): The recognized person.
+            now (float, optional): The current time as a Unix timestamp. Defaults to now.
+
+        Returns:
+            bool: True if the person may be punched, False if they are still in cooldown.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._evict(now)
+            if name in self._punched_at:
+                return False
+            self._punched_at[name] = now
+            return True
+
+    def release(self, name):
+        """
+        Ends the cooldown of a person early, e.g. because their punch could not be queued.
+
+        Args:
+            name (str): The person.
+        """
+        with self._lock:
+            self._punched_at.pop(name, None)
+
+
+class SqliteCooldownCache:
+    """
+    A cooldown keyed by identity and stored in SQLite, shared between processes.
+    """
+
+    def __init__(self, db_file=ATTENDANCE_DB_FILE, ttl=MIN_TIME_BETWEEN_RECORDS):
+        """
+        Initializes the SqliteCooldownCache, creating its table if needed.
+
+        Args:
+            db_file (str): The SQLite database file.
+            ttl (float): How long a person stays in cooldown after a punch, in seconds.
+        """
+        self.db_file = db_file
+        self.ttl = ttl
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS punch_cooldowns (name TEXT PRIMARY KEY, punched_at REAL NOT NULL)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.db_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_file, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM punch_cooldowns WHERE punched_at > ?", (time.time() - self.ttl,)
+        ).fetchone()
+        return row[0]
+
+    def acquire(self, name, now=None):
+        """
+        Starts the cooldown of a person unless it is already running in any process.
+
+        Args:
+            name (str): The recognized person.
+            now (float, optional): The current time as a Unix timestamp. Defaults to now.
+
+        Returns:
+            bool: True if the person may be punched, False if they are still in cooldown.
+        """
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM punch_cooldowns WHERE punched_at <= ?", (now - self.ttl,))
+            if conn.execute("SELECT 1 FROM punch_cooldowns WHERE name = ?", (name,)).fetchone():
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT INTO punch_cooldowns (name, punched_at) VALUES (?, ?)", (name, now))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, name):
+        """
+        Ends the cooldown of a person early, e.g. because their punch could not be queued.
+
+        Args:
+            name (str): The person.
+        """
+        self._connect().execute("DELETE FROM punch_cooldowns WHERE name = ?", (name,))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cooldown_cache():
+    """
+    Returns the process-wide cooldown cache selected by PUNCH_COOLDOWN_BACKEND.
+
+    Returns:
+        CooldownCache or SqliteCooldownCache: The shared cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if PUNCH_COOLDOWN_BACKEND == "sqlite":
+                _cache = SqliteCooldownCache()
+            else:
+                _cache = CooldownCache()
+        return _cache
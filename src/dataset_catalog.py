@@ -0,0 +1,297 @@
+"""
+Dataset catalog for the Face Recognition Attendance System.
+
+The catalog is one JSON file describing the dataset: for every person, the
+number and total size of their images and the faces encoded from them, and
+for every image its size, content hash, face count and thumbnail. The
+thumbnails are small JPEG copies kept in THUMBNAIL_DIR.
+
+`save_image` and `delete_person` keep the catalog up to date and the face
+encoder records its face counts, so the admin dashboard can list the dataset
+and preview images without walking the dataset directory or decoding
+full-size images. The catalog is replaced atomically on every change, like
+the gallery header.
+
+Run this file directly to rebuild the catalog from the dataset directory.
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from PIL import Image
+from config import DATASET_DIR, DATASET_CATALOG_FILE, THUMBNAIL_DIR, THUMBNAIL_SIZE
+
+CATALOG_FORMAT = "dataset-catalog"
+CATALOG_FORMAT_VERSION = 2
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def make_thumbnail(image, size=THUMBNAIL_SIZE):
+    """
+    Shrinks an image to a JPEG thumbnail.
+
+    Args:
+        image: A PIL image, or a file or path PIL can open.
+        size (int): The longest side of the thumbnail, in pixels.
+
+    Returns:
+        bytes: The thumbnail as JPEG data.
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    # draft() lets the JPEG decoder skip most of a large image
+    image.draft("RGB", (size, size))
+    thumbnail = image.convert("RGB")
+    thumbnail.thumbnail((size, size))
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetCatalog:
+    """
+    The image counts, sizes, hashes, face counts and thumbnails of the dataset.
+    """
+
+    def __init__(self, catalog_file=DATASET_CATALOG_FILE, dataset_dir=DATASET_DIR, thumbnail_dir=THUMBNAIL_DIR):
+        """
+        Initializes the DatasetCatalog. The catalog file is read on first use.
+
+        Args:
+            catalog_file (str): The JSON catalog file.
+            dataset_dir (str): The dataset directory, with one folder of images per person.
+            thumbnail_dir (str): The directory for the thumbnails.
+        """
+        self.catalog_file = catalog_file
+        self.dataset_dir = dataset_dir
+        self.thumbnail_dir = thumbnail_dir
+        self._lock = threading.RLock()
+        self._people = None
+        self._mtime = None
+
+    def _load(self):
+        """Returns the catalog, re-reading it if another process changed it and building it if it is missing."""
+        try:
+            mtime = os.stat(self.catalog_file).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._people is not None and mtime == self._mtime:
+            return self._people
+
+        if mtime is None:
+            self.rebuild()
+            return self._people
+
+        try:
+            with open(self.catalog_file, "r") as f:
+                catalog = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Rebuilding unreadable dataset catalog {self.catalog_file}: {e}")
+            self.rebuild()
+            return self._people
+        if catalog.get("format") != CATALOG_FORMAT or catalog.get("format_version") != CATALOG_FORMAT_VERSION:
+            # Older thumbnails may be named differently, so make them all again
+            shutil.rmtree(self.thumbnail_dir, ignore_errors=True)
+            self.rebuild()
+            return self._people
+
+        self._people = catalog["people"]
+        self._mtime = mtime
+        return self._people
+
+    def _save(self):
+        directory = os.path.dirname(self.catalog_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        catalog = {"format": CATALOG_FORMAT, "format_version": CATALOG_FORMAT_VERSION, "people": self._people}
+        tmp_path = self.catalog_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(catalog, f, indent=2)
+        os.replace(tmp_path, self.catalog_file)
+        self._mtime = os.stat(self.catalog_file).st_mtime_ns
+
+    def _thumbnail_path(self, person, file_name):
+        # Keep the extension, so a.jpg and a.png get their own thumbnails
+        return os.path.join(self.thumbnail_dir, person, file_name + ".jpg")
+
+    @staticmethod
+    def _update_totals(entry):
+        images = entry["images"].values()
+        entry["image_count"] = len(entry["images"])
+        entry["total_bytes"] = sum(image["size"] for image in images)
+        entry["encoded_faces"] = sum(image["faces"] or 0 for image in images)
+
+    def _entry(self, person, file_name, image=None, known=None):
+        """Describes one image, writing its thumbnail unless the known entry is unchanged."""
+        path = os.path.join(self.dataset_dir, person, file_name)
+        stat = os.stat(path)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime_ns:
+            return known
+
+        content_hash = _file_hash(path)
+        faces = known["faces"] if known and known["hash"] == content_hash else None
+        thumbnail_path = self._thumbnail_path(person, file_name)
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        with open(thumbnail_path, "wb") as f:
+            f.write(make_thumbnail(image if image is not None else path))
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": content_hash,
+            "faces": faces,
+            "thumbnail": os.path.relpath(thumbnail_path, self.thumbnail_dir),
+        }
+
+    def rebuild(self):
+        """
+        Rebuilds the catalog from the dataset directory.
+
+        Unchanged images keep their face counts and thumbnails.
+        """
+        with self._lock:
+            known = self._people or {}
+            people = {}
+            if os.path.exists(self.dataset_dir):
+                for person in sorted(os.listdir(self.dataset_dir)):
+                    person_dir = os.path.join(self.dataset_dir, person)
+                    if not os.path.isdir(person_dir):
+                        continue
+                    known_images = known.get(person, {}).get("images", {})
+                    entry = {"images": {}}
+                    for file_name in sorted(os.listdir(person_dir)):
+                        if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                            try:
+                                entry["images"][file_name] = self._entry(person, file_name, known=known_images.get(file_name))
+                            except Exception as e:
+                                print(f"[WARNING] Could not catalog {os.path.join(person_dir, file_name)}: {e}")
+                    self._update_totals(entry)
+                    people[person] = entry
+
+            for person in set(known) - set(people):
+                shutil.rmtree(os.path.join(self.thumbnail_dir, person), ignore_errors=True)
+            self._people = people
+            self._save()
+
+    def people(self):
+        """
+        Lists everyone in the dataset.
+
+        Returns:
+            list: The sorted person folder names.
+        """
+        with self._lock:
+            return sorted(self._load())
+
+    def summary(self):
+        """
+        Returns the per-person totals.
+
+        Returns:
+            list: One dict per person, sorted by name, with "name", "images" (the
+            image count), "bytes" and "faces" (the encoded faces).
+        """
+        with self._lock:
+            people = self._load()
+            return [
+                {
+                    "name": person,
+                    "images": people[person]["image_count"],
+                    "bytes": people[person]["total_bytes"],
+                    "faces": people[person]["encoded_faces"],
+                }
+                for person in sorted(people)
+            ]
+
+    def thumbnails(self, person):
+        """
+        Lists the thumbnails of a person's images.
+
+        Args:
+            person (str): The person folder name.
+
+        Returns:
+            list: The thumbnail paths, in image order.
+        """
+        with self._lock:
+            images = self._load().get(person, {}).get("images", {})
+            return [os.path.join(self.thumbnail_dir, images[name]["thumbnail"]) for name in sorted(images)]
+
+    def add_image(self, person, file_path, image=None):
+        """
+        Adds a newly saved image of a person.
+
+        Args:
+            person (str): The person folder name.
+            file_path (str): The saved image, inside the person's folder.
+            image (PIL.Image, optional): The decoded image, to make the thumbnail without decoding it again.
+        """
+        with self._lock:
+            people = self._load()
+            entry = people.setdefault(person, {"images": {}})
+            file_name = os.path.basename(file_path)
+            entry["images"][file_name] = self._entry(person, file_name, image=image)
+            self._update_totals(entry)
+            self._save()
+
+    def remove_person(self, person):
+        """
+        Removes a person and their thumbnails.
+
+        Args:
+            person (str): The person folder name.
+        """
+        with self._lock:
+            people = self._load()
+            if people.pop(person, None) is not None:
+                self._save()
+            shutil.rmtree(os.path.join(self.thumbnail_dir, person), ignore_errors=True)
+
+    def record_encodings(self, face_counts):
+        """
+        Records how many faces were encoded from each image.
+
+        Args:
+            face_counts (dict): Face counts keyed by image path relative to the dataset,
+                as in the encoding manifest. Cataloged images missing from it failed to encode.
+        """
+        with self._lock:
+            people = self._load()
+            for person, entry in people.items():
+                for file_name, image in entry["images"].items():
+                    image["faces"] = face_counts.get(os.path.join(person, file_name), 0)
+                self._update_totals(entry)
+            self._save()
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_dataset_catalog():
+    """
+    Returns the process-wide dataset catalog.
+
+    Returns:
+        DatasetCatalog: The shared catalog.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = DatasetCatalog()
+        return _catalog
+
+
+if __name__ == "__main__":
+    catalog = get_dataset_catalog()
+    catalog.rebuild()
+    print(f"Cataloged {sum(person['images'] for person in catalog.summary())} images of {len(catalog.people())} people.")
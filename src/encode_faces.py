@@ -2,55 +2,283 @@
 Face encoding script for the Face Recognition Attendance System.
 
 This script iterates through the dataset of face images, computes the
-face encodings for each face, and saves the encodings to a pickle file.
+face encodings for each face, and saves the encodings to the gallery directory.
 """
 
 import face_recognition
+import hashlib
+import multiprocessing
 import os
 import pickle
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
-from config import DATASET_DIR, ENCODINGS_FILE
+from config import (
+    DATASET_DIR,
+    GALLERY_DIR,
+    ENCODINGS_MANIFEST_FILE,
+    ANN_INDEX_FILE,
+    USE_ANN_INDEX,
+    COMPRESS_GALLERY,
+    ENCODING_WORKERS,
+    ENCODING_CHUNK_SIZE,
+)
+from ann_index import IVFIndex, recall_report
+from gallery import build_prototypes
+from gallery_store import save_gallery
+from dataset_catalog import get_dataset_catalog
 
-def encode_faces():
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Cached encodings are only reused if they were produced with the same settings
+ENCODER_SETTINGS = {
+    "face_recognition": face_recognition.__version__,
+    "detector": "hog",
+    "upsample": 1,
+    "landmarks": "small",
+    "num_jitters": 1,
+}
+MANIFEST_VERSION = 1
+
+def list_dataset_images():
     """
-    Encodes all the faces in the dataset and saves them to a pickle file.
+    Lists every image in the dataset in a deterministic order.
+
+    Returns:
+        list: (person_name, img_path) tuples, sorted by person and file name.
     """
-    known_encodings = []
-    known_names = []
-    
-    print("Starting face encoding process...")
-    for person_name in os.listdir(DATASET_DIR):
+    images = []
+    for person_name in sorted(os.listdir(DATASET_DIR)):
         person_dir = os.path.join(DATASET_DIR, person_name)
         if not os.path.isdir(person_dir):
             continue
-            
-        for img_name in os.listdir(person_dir):
-            img_path = os.path.join(person_dir, img_name)
+
+        for img_name in sorted(os.listdir(person_dir)):
             # Check if it's an image file
-            if not img_name.lower().endswith(('.jpg', '.jpeg', '.png')):
-                continue
-                
-            try:
-                print(f"Processing {person_name}/{img_name}...")
-                image = face_recognition.load_image_file(img_path)
-                
-                # The face_encodings function can find multiple faces, so we use a loop
-                encodings = face_recognition.face_encodings(image)
-                
-                for encoding in encodings:
-                    # Append the encoding and the person's name (folder name)
-                    known_encodings.append(encoding)
-                    known_names.append(person_name)
-            except Exception as e:
-                print(f"[WARNING] Could not process image {img_path}: {e}")
-    
+            if img_name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((person_name, os.path.join(person_dir, img_name)))
+    return images
+
+def encode_image(img_path):
+    """
+    Computes the face encodings of a single image.
+
+    This runs inside the worker processes, so it returns errors instead of raising.
+
+    Args:
+        img_path (str): The path to the image.
+
+    Returns:
+        tuple: The list of encodings found, and an error message or None.
+    """
+    try:
+        image = face_recognition.load_image_file(img_path)
+        # The face_encodings function can find multiple faces
+        return face_recognition.face_encodings(image), None
+    except Exception as e:
+        return [], str(e)
+
+def encode_images(img_paths, workers=ENCODING_WORKERS, chunksize=ENCODING_CHUNK_SIZE, executor=None, progress=None):
+    """
+    Encodes a list of images, in parallel when more than one worker is used.
+
+    Args:
+        img_paths (list): The paths of the images to encode.
+        workers (int): The number of worker processes. 0 uses every core, 1 runs serially.
+        chunksize (int): The number of images handed to a worker at a time.
+        executor (ProcessPoolExecutor, optional): A long-lived pool to use instead of
+            starting a new one, so its workers keep the models loaded between runs.
+        progress (callable, optional): Called with (done, total) after every image.
+
+    Returns:
+        list: An (encodings, error) tuple per image, in the same order as `img_paths`.
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(img_paths))
+    if executor is None and workers <= 1:
+        return _collect(map(encode_image, img_paths), len(img_paths), progress)
+
+    # map keeps the results in submission order regardless of which worker finishes first
+    if executor is not None:
+        return _collect(executor.map(encode_image, img_paths, chunksize=chunksize), len(img_paths), progress)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return _collect(pool.map(encode_image, img_paths, chunksize=chunksize), len(img_paths), progress)
+
+def _collect(results_iter, total, progress):
+    """Drains an iterator of per-image results, reporting progress as they arrive."""
+    results = []
+    for result in results_iter:
+        results.append(result)
+        if progress:
+            progress(len(results), total)
+    return results
+
+def file_hash(path):
+    """
+    Computes the SHA-1 hash of a file's contents.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest():
+    """
+    Loads the per-image encoding manifest.
+
+    Returns:
+        dict: The manifest entries keyed by image path relative to the dataset.
+        Empty if there is no manifest or it was built with different settings.
+    """
+    if not os.path.exists(ENCODINGS_MANIFEST_FILE):
+        return {}
+    try:
+        with open(ENCODINGS_MANIFEST_FILE, "rb") as f:
+            manifest = pickle.load(f)
+    except Exception as e:
+        print(f"[WARNING] Ignoring unreadable manifest {ENCODINGS_MANIFEST_FILE}: {e}")
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("encoder") != ENCODER_SETTINGS:
+        return {}
+    return manifest["entries"]
+
+def save_manifest(entries):
+    """
+    Saves the per-image encoding manifest atomically.
+
+    Args:
+        entries (dict): The manifest entries keyed by image path relative to the dataset.
+    """
+    manifest = {"version": MANIFEST_VERSION, "encoder": ENCODER_SETTINGS, "entries": entries}
+    os.makedirs(os.path.dirname(ENCODINGS_MANIFEST_FILE), exist_ok=True)
+    tmp_file = ENCODINGS_MANIFEST_FILE + ".tmp"
+    with open(tmp_file, "wb") as f:
+        pickle.dump(manifest, f)
+    os.replace(tmp_file, ENCODINGS_MANIFEST_FILE)
+
+def encode_faces(executor=None, progress=None):
+    """
+    Encodes all the faces in the dataset and saves them to the gallery directory.
+
+    Images whose size and modification time, or failing that content hash,
+    match the manifest reuse their cached encodings; only new or changed
+    images are decoded and encoded.
+
+    Args:
+        executor (ProcessPoolExecutor, optional): A long-lived pool to encode with.
+        progress (callable, optional): Called with (done, total) after every encoded image.
+
+    Returns:
+        dict: The number of "faces" saved, images "encoded", "reused" and "dropped",
+        the gallery "generation", and the (img_path, error) pairs in "errors",
+        which are left to the caller to report.
+    """
+    known_encodings = []
+    known_names = []
+    errors = []
+
+    print("Starting face encoding process...")
+    images = list_dataset_images()
+    cached = load_manifest()
+    entries = {}
+    to_encode = []
+
+    for person_name, img_path in images:
+        key = os.path.relpath(img_path, DATASET_DIR)
+        stat = os.stat(img_path)
+        entry = cached.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            entries[key] = entry
+            continue
+
+        content_hash = file_hash(img_path)
+        if entry and entry["hash"] == content_hash:
+            entries[key] = dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns)
+        else:
+            entries[key] = {"hash": content_hash, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+            to_encode.append((key, img_path))
+
+    reused = len(images) - len(to_encode)
+    results = encode_images([img_path for _, img_path in to_encode], executor=executor, progress=progress)
+    for (key, img_path), (encodings, error) in zip(to_encode, results):
+        if error:
+            # Leave failed images out of the manifest so they are retried next time
+            del entries[key]
+            errors.append((img_path, error))
+        else:
+            entries[key]["encodings"] = encodings
+
+    dropped = len(set(cached) - set(entries))
+    print(f"Reused {reused} images, encoded {len(to_encode) - len(errors)}, dropped {dropped} deleted.")
+    save_manifest(entries)
+
+    # Pick up images added or removed outside the dashboard, then record the face counts
+    try:
+        catalog = get_dataset_catalog()
+        catalog.rebuild()
+        catalog.record_encodings({key: len(entry["encodings"]) for key, entry in entries.items()})
+    except Exception as e:
+        print(f"[WARNING] Could not update the dataset catalog: {e}")
+
+    for person_name, img_path in images:
+        entry = entries.get(os.path.relpath(img_path, DATASET_DIR))
+        if entry is None:
+            continue
+        for encoding in entry["encodings"]:
+            # Append the encoding and the person's name (folder name)
+            known_encodings.append(encoding)
+            known_names.append(person_name)
+
     print(f"\nFound and encoded {len(known_names)} faces.")
     
-    # Save the encodings to a pickle file
-    data = {"encodings": known_encodings, "names": known_names}
-    with open(ENCODINGS_FILE, "wb") as f:
-        pickle.dump(data, f)
-    print(f"Encodings saved to {ENCODINGS_FILE}")
+    # The index must be in place before the new header is published, or a
+    # running app may load the new generation and reject the old index as stale
+    if USE_ANN_INDEX and known_encodings:
+        build_ann_index(known_encodings)
+
+    # Save the encodings as a new gallery generation
+    prototypes = None
+    if COMPRESS_GALLERY and known_encodings:
+        prototypes = build_prototypes(known_encodings, known_names)
+        print(f"Compressed gallery to {len(prototypes['names'])} prototypes.")
+    header = save_gallery(known_encodings, known_names, encoder=ENCODER_SETTINGS, prototypes=prototypes)
+    print(f"Encodings saved to {GALLERY_DIR} (generation {header['generation']})")
+
+    return {
+        "faces": len(known_names),
+        "encoded": len(to_encode) - len(errors),
+        "reused": reused,
+        "dropped": dropped,
+        "generation": header["generation"],
+        "errors": errors,
+    }
+
+def build_ann_index(encodings):
+    """
+    Builds the approximate nearest-neighbour index and saves it next to the encodings.
+
+    Args:
+        encodings (list): The face encodings about to be saved.
+    """
+    os.makedirs(os.path.dirname(ANN_INDEX_FILE), exist_ok=True)
+    matrix = np.asarray(encodings, dtype=np.float32)
+    index = IVFIndex.build(matrix)
+    index.save(ANN_INDEX_FILE, matrix)
+    report = recall_report(matrix, index)
+    print(
+        f"ANN index with {index.n_lists} lists saved to {ANN_INDEX_FILE} "
+        f"(recall@1 {report['recall_at_1']:.3f}, "
+        f"{report['ann_ms_per_query']:.3f} ms vs {report['exact_ms_per_query']:.3f} ms exact)"
+    )
 
 if __name__ == "__main__":
-    encode_faces()
+    result = encode_faces()
+    for img_path, error in result["errors"]:
+        print(f"[WARNING] Could not process image {img_path}: {error}")
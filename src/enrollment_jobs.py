@@ -0,0 +1,148 @@
+"""
+Background enrollment jobs for the Face Recognition Attendance System.
+
+Enrollment and rebuild requests from the admin dashboard go into an
+in-process queue served by one worker thread. The worker keeps a process pool
+alive between jobs so the dlib models stay loaded, reports per-image progress
+on the job, and publishes the new gallery when a job finishes. Requests that
+arrive while a job is still waiting are folded into that job.
+"""
+
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from config import ENCODING_WORKERS
+from encode_faces import encode_faces
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class EnrollmentJob:
+    """The state of one enrollment or rebuild run, as shown on the dashboard."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, note=None):
+        self.id = next(EnrollmentJob._ids)
+        self.kind = kind
+        self.notes = [note] if note else []
+        self.requests = 1
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def report_progress(self, done, total):
+        self.done, self.total = done, total
+
+
+class EnrollmentQueue:
+    """
+    Runs enrollment jobs one at a time on a background thread.
+    """
+
+    def __init__(self, publish=None, workers=ENCODING_WORKERS, history_size=20):
+        """
+        Initializes the EnrollmentQueue. The worker thread starts with the first job.
+
+        Args:
+            publish (callable, optional): Called after every successful job to make
+                the new gallery live, e.g. `GalleryRegistry.reload`.
+            workers (int): The number of encoding processes. 0 uses every core, 1 encodes in the worker thread.
+            history_size (int): The number of finished jobs kept for display.
+        """
+        self.publish = publish
+        self.workers = workers or os.cpu_count() or 1
+        self.history_size = history_size
+        self.history = []
+        self._cond = threading.Condition()
+        self._pending = None
+        self._executor = None
+        self._thread = None
+
+    def submit(self, kind="rebuild", note=None):
+        """
+        Requests a rebuild of the gallery without waiting for it.
+
+        Args:
+            kind (str): A label for the job, e.g. "enroll" or "rebuild".
+            note (str, optional): A short description shown with the job.
+
+        Returns:
+            EnrollmentJob: The queued job, or the job this request was folded into.
+        """
+        with self._cond:
+            if self._pending is not None:
+                # A rebuild that has not started yet will pick up this change too
+                self._pending.requests += 1
+                if note:
+                    self._pending.notes.append(note)
+                return self._pending
+
+            job = EnrollmentJob(kind, note)
+            self._pending = job
+            self.history.append(job)
+            del self.history[:-self.history_size]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="enrollment-worker", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return job
+
+    @property
+    def latest(self):
+        """The most recently submitted job, or None."""
+        with self._cond:
+            return self.history[-1] if self.history else None
+
+    @property
+    def busy(self):
+        """Whether a job is queued or running."""
+        job = self.latest
+        return job is not None and not job.finished
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                job, self._pending = self._pending, None
+
+            job.status = RUNNING
+            try:
+                job.result = encode_faces(executor=self._get_executor(), progress=job.report_progress)
+                if self.publish:
+                    self.publish()
+                job.status = DONE
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+                # A broken pool is replaced on the next job
+                self._shutdown_executor()
+            job.finished_at = time.time()
+
+    def _get_executor(self):
+        if self.workers <= 1:
+            return None
+        if self._executor is None:
+            # Forking the server would copy its threads and locks into the workers
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -140,73 +140,72 @@ Face recognition service for the Streamlit application.
 
 import cv2
 import face_recognition
-import numpy as np
 import streamlit as st
 import time
-import os
-import pandas as pd
-from datetime import datetime
+import collections
 from config import (
     MIN_FACE_SIZE,
-    PROCESS_EVERY_N_FRAMES,
     DOWNSAMPLE_FACTOR,
-    MIN_TIME_BETWEEN_RECORDS,
-    LOG_FILE,
-    ENCODINGS_FILE,
+    GALLERY_DIR,
 )
 from streamlit_webrtc import VideoProcessorBase
-import pickle
+from gallery import UNKNOWN_NAME
+from gallery_registry import GalleryRegistry
+from attendance_queue import get_attendance_queue
+from cooldown import get_cooldown_cache
+from tracking import FaceTracker
+from recognition_worker import RecognitionWorker
+from scheduler import RecognitionScheduler
+from frame_gate import FrameGate, PASSED
 import av
 
 @st.cache_resource
+def get_gallery_registry():
+    """Creates the process-wide gallery registry and loads the current gallery."""
+    registry = GalleryRegistry()
+    try:
+        registry.reload()
+    except Exception as e:
+        st.error(f"Could not load the face gallery: {str(e)}")
+        return registry
+    if registry.generation == 0:
+        st.error(f"Face gallery not found at {GALLERY_DIR}. Please run 'encode_faces.py'.")
+    return registry
+
 def load_encodings():
-    """Loads the known face encodings from the pickle file."""
-    if os.path.exists(ENCODINGS_FILE):
-        with open(ENCODINGS_FILE, "rb") as f:
-            return pickle.load(f)
-    st.error(f"Encoding file not found at {ENCODINGS_FILE}. Please run 'encode_faces.py'.")
-    return {"encodings": [], "names": []}
+    """Returns the currently published face gallery."""
+    return get_gallery_registry().data
 
 def reload_encodings():
     """
     Forces a reload of the face encodings.
-    Call this after adding new users to the database.
+    Call this after adding new users to the database. Running streams
+    switch to the new gallery on their next recognition pass.
     """
-    st.cache_resource.clear()
-    return load_encodings()
+    return get_gallery_registry().reload()
 
 data = load_encodings()
 
-def mark_attendance(name):
-    """Marks the attendance for a given person."""
-    try:
-        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-        now = datetime.now()
-        date_str = now.strftime("%Y-%m-%d")
-        time_str = now.strftime("%H:%M:%S")
-
-        new_record = {
-            "Name": name,
-            "Date": date_str,
-            "Time": time_str,
-            "Status": "Punch In"
-        }
-
-        if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) > 0:
-            df = pd.read_csv(LOG_FILE)
-            todays_records = df[(df["Name"] == name) & (df["Date"] == date_str)]
-            
-            if not todays_records.empty:
-                last_status = todays_records["Status"].iloc[-1]
-                new_record["Status"] = "Punch Out" if last_status == "Punch In" else "Punch In"
-            
-            df = pd.concat([df, pd.DataFrame([new_record])], ignore_index=True)
-        else:
-            df = pd.DataFrame([new_record])
+def notify_attendance(record):
+    """Shows a toast for a committed attendance record."""
+    st.toast(f"✅ {record['Name']} {record['Status']} at {record['Time']}")
+
+def mark_attendance(name, on_commit=notify_attendance):
+    """
+    Queues the attendance of a given person for the background writer.
 
-        df.to_csv(LOG_FILE, index=False)
-        st.toast(f"✅ {name} {new_record['Status']} at {time_str}")
-        return True
+    Args:
+        name (str): The recognized person.
+        on_commit (callable, optional): Called with the record once it has been written.
+
+    Returns:
+        bool: True if the punch was queued.
+    """
+    try:
+        if get_attendance_queue().put(name, on_commit=on_commit):
+            return True
+        st.error(f"Attendance queue is full, dropped punch for {name}")
+        return False
 
     except Exception as e:
         st.error(f"Error in mark_attendance: {str(e)}")
@@ -218,64 +217,143 @@ class FaceRecognitionTransformer(VideoProcessorBase):
 
     def __init__(self):
         self.frame_count = 0
-        self.last_detection_time = {}
-        # Load fresh encodings when the transformer is initialized
-        self.data = load_encodings()
+        # Shared with every other stream, so a person is punched once per cooldown
+        self.cooldown = get_cooldown_cache()
+        # Punches committed by the attendance writer, waiting to be announced
+        self.committed = collections.deque()
+        # Follow the shared gallery; new generations are swapped in while running
+        self.registry = get_gallery_registry()
+        self.generation, self.matcher = self.registry.current()
+        self.tracker = FaceTracker()
+        self.scheduler = RecognitionScheduler()
+        self.gate = FrameGate()
+        # Recognition runs in the background; recv only draws its latest results
+        self.worker = RecognitionWorker(self._recognize)
+        self.worker.start()
+
+    def _recognize(self, img, frame_index, current_time):
+        """
+        Runs detection, tracking and matching on a frame in the worker thread.
+
+        Args:
+            img (np.ndarray): The BGR frame.
+            frame_index (int): The index of the frame in the stream.
+            current_time (float): The time the frame was received.
+
+        Returns:
+            list: The (top, right, bottom, left) box and name of every face to draw.
+        """
+        try:
+            if self.scheduler.should_run():
+                started = time.monotonic()
+
+                # Swap in a newer gallery and re-verify every track against it
+                generation, matcher = self.registry.current()
+                if generation != self.generation:
+                    self.generation, self.matcher = generation, matcher
+                    self.tracker.invalidate()
+
+                # Resize frame for faster processing
+                small_img = cv2.resize(img, (0, 0), fx=DOWNSAMPLE_FACTOR, fy=DOWNSAMPLE_FACTOR)
+                rgb_small_frame = cv2.cvtColor(small_img, cv2.COLOR_BGR2RGB)
+                gray_small_frame = cv2.cvtColor(small_img, cv2.COLOR_BGR2GRAY)
+
+                # Skip detection when nothing moved or the frame is unusable
+                if self.gate.check(gray_small_frame) != PASSED:
+                    gated = time.monotonic()
+                    self.tracker.skip(gray_small_frame)
+                    followed = time.monotonic()
+                    self.scheduler.record(
+                        started,
+                        {"gate": gated - started, "follow": followed - gated},
+                        len(self.tracker.tracks),
+                        now=followed,
+                    )
+                    return self._overlays()
+
+                # Find all the faces in the current frame that are large enough
+                face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")
+                detected = time.monotonic()
+                min_size = MIN_FACE_SIZE * DOWNSAMPLE_FACTOR
+                face_locations = [
+                    (top, right, bottom, left) for (top, right, bottom, left) in face_locations
+                    if (right - left) >= min_size and (bottom - top) >= min_size
+                ]
+
+                # Only new, unknown or stale tracks are encoded; the rest keep their identity
+                tracks = self.tracker.update(face_locations, gray_small_frame)
+                pending = [track for track in tracks if self.tracker.needs_encoding(track, current_time)]
+                face_encodings = face_recognition.face_encodings(rgb_small_frame, [track.box for track in pending])
+                encoded = time.monotonic()
+                matches = self.matcher.match(face_encodings)
+                matched = time.monotonic()
+
+                for track, (name, distance, index) in zip(pending, matches):
+                    self.tracker.verify(track, name, distance, current_time)
+
+                    # Mark attendance if not recorded recently
+                    if name != UNKNOWN_NAME:
+                        if self.cooldown.acquire(name, current_time):
+                            if not mark_attendance(name, on_commit=self.committed.append):
+                                self.cooldown.release(name)
+
+                finished = time.monotonic()
+                self.scheduler.record(
+                    started,
+                    {
+                        "detect": detected - started,
+                        "encode": encoded - detected,
+                        "match": matched - encoded,
+                        "attendance": finished - matched,
+                    },
+                    len(face_locations),
+                    now=finished,
+                )
+
+            elif self.tracker.tracks and self.tracker.use_optical_flow:
+                # Carry the boxes forward between detection passes
+                started = time.monotonic()
+                small_img = cv2.resize(img, (0, 0), fx=DOWNSAMPLE_FACTOR, fy=DOWNSAMPLE_FACTOR)
+                self.tracker.follow(cv2.cvtColor(small_img, cv2.COLOR_BGR2GRAY))
+                self.scheduler.add("follow", time.monotonic() - started)
+
+        except Exception as e:
+            st.error(f"Face detection error: {str(e)}")
+
+        while self.committed:
+            notify_attendance(self.committed.popleft())
+
+        return self._overlays()
+
+    def _overlays(self):
+        """Returns the box, scaled back up to the full frame, and name of every identified track."""
+        return [
+            (tuple(int(v / DOWNSAMPLE_FACTOR) for v in track.box), track.name)
+            for track in self.tracker.tracks if track.name is not None
+        ]
 
     def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
         """Processes a video frame to perform face recognition."""
         img = frame.to_ndarray(format="bgr24")
-        current_time = time.time()
 
-        if self.frame_count % PROCESS_EVERY_N_FRAMES == 0:
-            try:
-                # Resize frame for faster processing
-                small_img = cv2.resize(img, (0, 0), fx=DOWNSAMPLE_FACTOR, fy=DOWNSAMPLE_FACTOR)
-                rgb_small_frame = cv2.cvtColor(small_img, cv2.COLOR_BGR2RGB)
+        # Stale frames are replaced in the mailbox, never queued
+        self.worker.submit(img.copy(), self.frame_count, time.time())
 
-                # Find all the faces and face encodings in the current frame
-                face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-                for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                    # Scale back up face locations
-                    top = int(top / DOWNSAMPLE_FACTOR)
-                    right = int(right / DOWNSAMPLE_FACTOR)
-                    bottom = int(bottom / DOWNSAMPLE_FACTOR)
-                    left = int(left / DOWNSAMPLE_FACTOR)
-
-                    if (right - left) < MIN_FACE_SIZE or (bottom - top) < MIN_FACE_SIZE:
-                        continue
-
-                    # See if the face is a match for the known face(s)
-                    matches = face_recognition.compare_faces(self.data["encodings"], face_encoding)
-                    name = "Unknown"
-                    color = (0, 0, 255)  # Red for unknown
-
-                    if True in matches:
-                        face_distances = face_recognition.face_distance(self.data["encodings"], face_encoding)
-                        best_match_index = np.argmin(face_distances)
-                        
-                        if matches[best_match_index]:
-                            name = self.data["names"][best_match_index]
-                            color = (0, 255, 0)  # Green for known
-
-                            # Mark attendance if not recorded recently
-                            last_time = self.last_detection_time.get(name, 0)
-                            if current_time - last_time > MIN_TIME_BETWEEN_RECORDS:
-                                if mark_attendance(name):
-                                    self.last_detection_time[name] = current_time
-
-                    # Draw a box around the face
-                    cv2.rectangle(img, (left, top), (right, bottom), color, 2)
-                    
-                    # Draw a label with a name below the face
-                    cv2.rectangle(img, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-                    font = cv2.FONT_HERSHEY_DUPLEX
-                    cv2.putText(img, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
+        for (top, right, bottom, left), name in self.worker.latest:
+            color = (0, 0, 255) if name == UNKNOWN_NAME else (0, 255, 0)  # Red for unknown, green for known
+
+            # Draw a box around the face
+            cv2.rectangle(img, (left, top), (right, bottom), color, 2)
 
-            except Exception as e:
-                st.error(f"Face detection error: {str(e)}")
+            # Draw a label with a name below the face
+            cv2.rectangle(img, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+            font = cv2.FONT_HERSHEY_DUPLEX
+            cv2.putText(img, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
 
         self.frame_count += 1
         return av.VideoFrame.from_ndarray(img, format="bgr24")
+
+    def on_ended(self):
+        """Stops the recognition worker and writes out its pending punches when the stream ends."""
+        self.worker.stop()
+        get_attendance_queue().flush()
@@ -0,0 +1,123 @@
+"""
+Pre-detection frame gating for the Face Recognition Attendance System.
+
+Face detection is the most expensive step of a recognition pass, yet most
+frames from a door camera show an empty corridor. This module decides on a
+tiny copy of the frame whether anything moved and whether the frame is sharp
+and well exposed enough to be worth running detection on.
+"""
+
+import cv2
+import numpy as np
+from config import (
+    GATE_ENABLED,
+    GATE_WIDTH,
+    GATE_PIXEL_DIFF,
+    GATE_MOTION_THRESHOLD,
+    GATE_BACKGROUND_RATE,
+    GATE_MIN_SHARPNESS,
+    GATE_MIN_BRIGHTNESS,
+    GATE_MAX_BRIGHTNESS,
+)
+
+PASSED = "passed"
+NO_MOTION = "no_motion"
+BLURRY = "blurry"
+UNDEREXPOSED = "underexposed"
+OVEREXPOSED = "overexposed"
+
+
+class FrameGate:
+    """
+    Decides whether a frame should go on to face detection.
+
+    Motion is measured against a running-average background, so slow lighting
+    changes are absorbed while a person walking in is not. Sharpness is the
+    variance of the Laplacian and exposure is the mean brightness.
+    """
+
+    def __init__(
+        self,
+        enabled=GATE_ENABLED,
+        width=GATE_WIDTH,
+        pixel_diff=GATE_PIXEL_DIFF,
+        motion_threshold=GATE_MOTION_THRESHOLD,
+        background_rate=GATE_BACKGROUND_RATE,
+        min_sharpness=GATE_MIN_SHARPNESS,
+        min_brightness=GATE_MIN_BRIGHTNESS,
+        max_brightness=GATE_MAX_BRIGHTNESS,
+    ):
+        """
+        Initializes the FrameGate.
+
+        Args:
+            enabled (bool): When False, every frame passes.
+            width (int): The width the frame is shrunk to before measuring.
+            pixel_diff (int): The intensity change that counts a pixel as moving.
+            motion_threshold (float): The fraction of moving pixels needed to pass.
+            background_rate (float): How fast the background adapts to the scene.
+            min_sharpness (float): The minimum variance of the Laplacian.
+            min_brightness (float): The minimum mean brightness.
+            max_brightness (float): The maximum mean brightness.
+        """
+        self.enabled = enabled
+        self.width = width
+        self.pixel_diff = pixel_diff
+        self.motion_threshold = motion_threshold
+        self.background_rate = background_rate
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+
+        self.background = None
+        self.counts = {PASSED: 0, NO_MOTION: 0, BLURRY: 0, UNDEREXPOSED: 0, OVEREXPOSED: 0}
+
+    def check(self, gray):
+        """
+        Checks a grayscale frame.
+
+        Args:
+            gray (np.ndarray): The grayscale frame.
+
+        Returns:
+            str: "passed", or the reason the frame should be skipped.
+        """
+        decision = self._decide(gray) if self.enabled else PASSED
+        self.counts[decision] += 1
+        return decision
+
+    def _decide(self, gray):
+        scale = self.width / gray.shape[1]
+        tiny = cv2.resize(gray, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+
+        brightness = float(tiny.mean())
+        if brightness < self.min_brightness:
+            return UNDEREXPOSED
+        if brightness > self.max_brightness:
+            return OVEREXPOSED
+
+        if self.background is None:
+            # The first frame has nothing to compare against, so let it through
+            self.background = tiny.astype(np.float32)
+            motion = 1.0
+        else:
+            moving = cv2.absdiff(tiny, cv2.convertScaleAbs(self.background)) > self.pixel_diff
+            motion = float(moving.mean())
+            cv2.accumulateWeighted(tiny, self.background, self.background_rate)
+        if motion < self.motion_threshold:
+            return NO_MOTION
+
+        if cv2.Laplacian(tiny, cv2.CV_64F).var() < self.min_sharpness:
+            return BLURRY
+        return PASSED
+
+    def stats(self):
+        """
+        Returns how many frames were passed or skipped for each reason.
+
+        Returns:
+            dict: The decision counts and the fraction of frames skipped.
+        """
+        total = sum(self.counts.values())
+        skipped = total - self.counts[PASSED]
+        return {**self.counts, "skipped_fraction": skipped / total if total else 0.0}
@@ -0,0 +1,258 @@
+"""
+Gallery matching for the Face Recognition Attendance System.
+
+This module holds the known face encodings in a form that is cheap to
+search, so that every face in a frame can be matched against the whole
+gallery with a single batched distance computation.
+"""
+
+import numpy as np
+from config import FACE_MATCH_TOLERANCE, PROTOTYPES_PER_IDENTITY
+from ann_index import kmeans
+
+UNKNOWN_NAME = "Unknown"
+
+
+class GalleryMatcher:
+    """
+    Matches face encodings against the enrolled gallery.
+
+    The encodings are stored once as a contiguous float32 matrix together
+    with their squared norms, so a batch of query faces only costs one
+    matrix product instead of a Python-level loop per face.
+    """
+
+    def __init__(self, encodings, names, tolerance=FACE_MATCH_TOLERANCE, index=None):
+        """
+        Initializes the GalleryMatcher.
+
+        Args:
+            encodings (list or np.ndarray): The known 128-d face encodings.
+            names (list): The name for each encoding, in the same order.
+            tolerance (float): The maximum distance that still counts as a match.
+            index (IVFIndex, optional): An approximate index over `encodings`. When
+                given, matching scans only the probed lists instead of the whole gallery.
+        """
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+
+        self.names = list(names)
+        self.tolerance = tolerance
+        if len(encodings):
+            self.matrix = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32))
+        else:
+            self.matrix = np.empty((0, 128), dtype=np.float32)
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.index = index
+
+    @classmethod
+    def from_data(cls, data, tolerance=FACE_MATCH_TOLERANCE, index=None):
+        """
+        Builds a matcher from the dictionary returned by `load_encodings`.
+
+        Args:
+            data (dict): A dictionary with "encodings" and "names" lists.
+            tolerance (float): The maximum distance that still counts as a match.
+            index (IVFIndex, optional): An approximate index over the encodings.
+
+        Returns:
+            GalleryMatcher: The matcher for the given gallery.
+        """
+        return cls(data.get("encodings", []), data.get("names", []), tolerance, index)
+
+    def __len__(self):
+        return len(self.names)
+
+    def distances(self, face_encodings):
+        """
+        Computes the Euclidean distance from each query face to every gallery entry.
+
+        Args:
+            face_encodings (list or np.ndarray): The query encodings.
+
+        Returns:
+            np.ndarray: A (num_faces, gallery_size) float32 distance matrix.
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        sq_dists = q_norms[:, None] + self.sq_norms[None, :] - 2.0 * (queries @ self.matrix.T)
+        # Rounding can push exact matches slightly below zero
+        np.maximum(sq_dists, 0.0, out=sq_dists)
+        return np.sqrt(sq_dists)
+
+    def match(self, face_encodings):
+        """
+        Finds the best gallery match for each query face.
+
+        Args:
+            face_encodings (list or np.ndarray): The query encodings.
+
+        Returns:
+            list: A (name, distance, index) tuple per face. Faces with no match
+            within the tolerance get the name "Unknown" and an index of -1.
+        """
+        if len(face_encodings) == 0:
+            return []
+        if len(self) == 0:
+            return [(UNKNOWN_NAME, float("inf"), -1) for _ in range(len(face_encodings))]
+
+        if self.index is not None:
+            queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+            best, best_dists = self.index.search(self.matrix, self.sq_norms, queries)
+        else:
+            dists = self.distances(face_encodings)
+            best = np.argmin(dists, axis=1)
+            best_dists = dists[np.arange(len(best)), best]
+
+        results = []
+        for index, distance in zip(best.tolist(), best_dists.tolist()):
+            if distance <= self.tolerance:
+                results.append((self.names[index], distance, index))
+            else:
+                results.append((UNKNOWN_NAME, distance, -1))
+        return results
+
+
+def build_prototypes(encodings, names, k=PROTOTYPES_PER_IDENTITY):
+    """
+    Compresses each identity to its centroid plus up to k medoids.
+
+    The radius of an identity is the largest distance from any of its raw
+    encodings to the nearest of its prototypes, which lets the matcher bound
+    the distance to the raw encodings without scanning them.
+
+    Args:
+        encodings (list or np.ndarray): The known 128-d face encodings.
+        names (list): The name for each encoding, in the same order.
+        k (int): The number of medoids kept per identity.
+
+    Returns:
+        dict: The prototype "encodings", the "names" of their identities,
+        and the per-identity "identity_names" and "radii".
+    """
+    matrix = np.asarray(encodings, dtype=np.float32)
+    names = np.asarray(names, dtype=object)
+    identity_names = sorted(set(names.tolist()))
+
+    proto_encodings = []
+    proto_names = []
+    radii = []
+    for name in identity_names:
+        points = matrix[names == name]
+        if len(points) <= k + 1:
+            # Too few encodings to be worth compressing, keep them all
+            prototypes = points
+        else:
+            centers, _ = kmeans(points, k)
+            medoids = [points[np.argmin(np.linalg.norm(points - c, axis=1))] for c in centers]
+            prototypes = np.vstack([points.mean(axis=0, keepdims=True), medoids])
+
+        dists = np.linalg.norm(points[:, None, :] - prototypes[None, :, :], axis=2)
+        radii.append(float(dists.min(axis=1).max()))
+        proto_encodings.extend(prototypes)
+        proto_names.extend([name] * len(prototypes))
+
+    return {
+        "encodings": np.asarray(proto_encodings, dtype=np.float32),
+        "names": proto_names,
+        "identity_names": identity_names,
+        "radii": np.asarray(radii, dtype=np.float32),
+    }
+
+
+class PrototypeMatcher(GalleryMatcher):
+    """
+    Matches faces against per-identity prototypes first.
+
+    Each query is compared with the small prototype set. The triangle
+    inequality turns the prototype distance and the identity radius into a
+    lower bound on the distance to that identity's raw encodings, so only
+    identities whose bound is still competitive are scanned in full. The
+    result is the same as the exact scan over all raw encodings.
+    """
+
+    def __init__(self, encodings, names, prototypes, tolerance=FACE_MATCH_TOLERANCE):
+        """
+        Initializes the PrototypeMatcher.
+
+        Args:
+            encodings (list or np.ndarray): The known 128-d face encodings.
+            names (list): The name for each encoding, in the same order.
+            prototypes (dict): The output of `build_prototypes` for this gallery.
+            tolerance (float): The maximum distance that still counts as a match.
+        """
+        super().__init__(encodings, names, tolerance)
+
+        self.identity_names = list(prototypes["identity_names"])
+        self.radii = np.asarray(prototypes["radii"], dtype=np.float32)
+        identity_ids = {name: i for i, name in enumerate(self.identity_names)}
+
+        # Prototypes are stored grouped by identity, so each identity is a column range
+        proto_ids = np.array([identity_ids[name] for name in prototypes["names"]])
+        self.proto_matrix = np.ascontiguousarray(prototypes["encodings"], dtype=np.float32)
+        self.proto_sq_norms = np.einsum("ij,ij->i", self.proto_matrix, self.proto_matrix)
+        self.proto_offsets = np.flatnonzero(np.r_[True, proto_ids[1:] != proto_ids[:-1]])
+
+        raw_ids = np.array([identity_ids[name] for name in self.names])
+        self.rows_by_identity = [np.flatnonzero(raw_ids == i) for i in range(len(self.identity_names))]
+
+    @classmethod
+    def from_data(cls, data, tolerance=FACE_MATCH_TOLERANCE):
+        """
+        Builds a matcher from a loaded encodings dictionary that has "prototypes".
+
+        Args:
+            data (dict): A dictionary with "encodings", "names" and "prototypes".
+            tolerance (float): The maximum distance that still counts as a match.
+
+        Returns:
+            PrototypeMatcher: The matcher for the given gallery.
+        """
+        return cls(data["encodings"], data["names"], data["prototypes"], tolerance)
+
+    def match(self, face_encodings):
+        """
+        Finds the best gallery match for each query face.
+
+        Args:
+            face_encodings (list or np.ndarray): The query encodings.
+
+        Returns:
+            list: A (name, distance, index) tuple per face, as for `GalleryMatcher.match`.
+            The distance of an unknown face is a lower bound on its distance to the
+            nearest encoding, still above the tolerance.
+        """
+        if len(face_encodings) == 0:
+            return []
+        if len(self) == 0:
+            return [(UNKNOWN_NAME, float("inf"), -1) for _ in range(len(face_encodings))]
+
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        sq_dists = q_norms[:, None] + self.proto_sq_norms[None, :] - 2.0 * (queries @ self.proto_matrix.T)
+        np.maximum(sq_dists, 0.0, out=sq_dists)
+        identity_dists = np.sqrt(np.minimum.reduceat(sq_dists, self.proto_offsets, axis=1))
+        lower_bounds = identity_dists - self.radii[None, :]
+
+        results = []
+        for q, query in enumerate(queries):
+            best_index, best_distance = -1, float("inf")
+            for identity in np.argsort(lower_bounds[q]):
+                bound = lower_bounds[q, identity]
+                if bound > self.tolerance or bound >= best_distance:
+                    # No identity left can be closer than this bound
+                    best_distance = min(best_distance, float(bound))
+                    break
+                # Borderline identity: fall back to its raw encodings
+                rows = self.rows_by_identity[identity]
+                diff = self.matrix[rows] - query
+                dists = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+                best = int(np.argmin(dists))
+                if dists[best] < best_distance:
+                    best_index, best_distance = int(rows[best]), float(dists[best])
+
+            if best_index >= 0 and best_distance <= self.tolerance:
+                results.append((self.names[best_index], best_distance, best_index))
+            else:
+                results.append((UNKNOWN_NAME, best_distance, -1))
+        return results
@@ -0,0 +1,189 @@
+"""
+Live gallery registry for the Face Recognition Attendance System.
+
+The registry owns the matcher that running video streams use. It watches the
+gallery header for new generations written by encode_faces.py, and also
+accepts add/remove-identity deltas directly. Every change builds a complete
+new matcher and swaps it in under a lock with a bumped generation counter,
+so streams pick it up on their next recognition pass without a restart.
+"""
+
+import os
+import threading
+import time
+import numpy as np
+from config import (
+    GALLERY_DIR,
+    ENCODINGS_FILE,
+    ANN_INDEX_FILE,
+    USE_ANN_INDEX,
+    ANN_MIN_GALLERY_SIZE,
+    COMPRESS_GALLERY,
+    GALLERY_POLL_SECONDS,
+)
+from gallery import GalleryMatcher, PrototypeMatcher, build_prototypes
+from gallery_store import HEADER_FILE, load_gallery, read_header, convert_pickle
+from ann_index import IVFIndex
+
+EMPTY_GALLERY = {"encodings": [], "names": []}
+
+
+def build_matcher(data):
+    """
+    Builds the matcher that fits a loaded gallery.
+
+    Args:
+        data (dict): A gallery with "encodings", "names" and optionally "prototypes".
+
+    Returns:
+        GalleryMatcher: A PrototypeMatcher if the gallery has prototypes, otherwise
+        an exact matcher, with the ANN index attached when enabled and up to date.
+    """
+    if data.get("prototypes"):
+        return PrototypeMatcher.from_data(data)
+    matcher = GalleryMatcher.from_data(data)
+    if USE_ANN_INDEX and len(matcher) >= ANN_MIN_GALLERY_SIZE:
+        # A missing or stale index silently falls back to the exact scan
+        matcher.index = IVFIndex.load(ANN_INDEX_FILE, matcher.matrix)
+    return matcher
+
+
+class GalleryRegistry:
+    """
+    Holds the current gallery and matcher, and swaps in new ones atomically.
+    """
+
+    def __init__(self, directory=GALLERY_DIR, poll_interval=GALLERY_POLL_SECONDS):
+        """
+        Initializes the GalleryRegistry with an empty gallery.
+
+        Args:
+            directory (str): The gallery directory to watch.
+            poll_interval (float): The minimum number of seconds between checks of the header.
+        """
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._snapshot = (0, EMPTY_GALLERY, build_matcher(EMPTY_GALLERY))
+        self._disk_generation = None
+        self._header_mtime = None
+        self._next_poll = 0.0
+
+    @property
+    def generation(self):
+        """The number of times a new gallery has been published."""
+        return self._snapshot[0]
+
+    @property
+    def data(self):
+        """The currently published gallery."""
+        return self._snapshot[1]
+
+    @property
+    def matcher(self):
+        """The matcher for the currently published gallery."""
+        return self._snapshot[2]
+
+    def current(self):
+        """
+        Returns the current generation and matcher, picking up a new gallery on disk first.
+
+        Returns:
+            tuple: The (generation, matcher) pair.
+        """
+        now = time.monotonic()
+        if now >= self._next_poll:
+            self._next_poll = now + self.poll_interval
+            if self._header_changed():
+                self.reload(blocking=False)
+        snapshot = self._snapshot
+        return snapshot[0], snapshot[2]
+
+    def _header_changed(self):
+        try:
+            mtime = os.stat(os.path.join(self.directory, HEADER_FILE)).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._header_mtime:
+            return False
+        header = read_header(self.directory)
+        return header is not None and header["generation"] != self._disk_generation
+
+    def reload(self, blocking=True):
+        """
+        Loads the gallery from disk and publishes it.
+
+        A legacy encodings.pickle is converted first if there is no gallery yet.
+
+        Args:
+            blocking (bool): Whether to wait if another thread is already reloading.
+
+        Returns:
+            dict: The published gallery.
+        """
+        if not self._reload_lock.acquire(blocking=blocking):
+            return self.data
+        try:
+            header_path = os.path.join(self.directory, HEADER_FILE)
+            data = load_gallery(self.directory)
+            if data is None and os.path.exists(ENCODINGS_FILE):
+                # One-time migration from the legacy pickle format
+                convert_pickle(ENCODINGS_FILE, self.directory)
+                data = load_gallery(self.directory)
+            if data is None:
+                return self.data
+
+            self._disk_generation = data["generation"]
+            self._header_mtime = os.stat(header_path).st_mtime_ns
+            self._publish(data)
+            return data
+        finally:
+            self._reload_lock.release()
+
+    def add_identity(self, name, encodings):
+        """
+        Publishes the current gallery with encodings added for one identity.
+
+        The delta lives in memory only; the next generation written by
+        encode_faces.py replaces it.
+
+        Args:
+            name (str): The identity to add to, or create.
+            encodings (list or np.ndarray): The new 128-d encodings.
+        """
+        new = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+        with self._reload_lock:
+            data = self.data
+            if len(data["names"]):
+                matrix = np.vstack([np.asarray(data["encodings"], dtype=np.float32), new])
+            else:
+                matrix = new
+            self._publish_delta(matrix, list(data["names"]) + [name] * len(new))
+
+    def remove_identity(self, name):
+        """
+        Publishes the current gallery without the given identity.
+
+        Args:
+            name (str): The identity to remove.
+        """
+        with self._reload_lock:
+            data = self.data
+            keep = np.array([n != name for n in data["names"]], dtype=bool)
+            if keep.all():
+                return
+            matrix = np.asarray(data["encodings"], dtype=np.float32)[keep] if keep.any() else []
+            self._publish_delta(matrix, [n for n, k in zip(data["names"], keep) if k])
+
+    def _publish_delta(self, matrix, names):
+        data = {"encodings": matrix, "names": names}
+        if COMPRESS_GALLERY and names:
+            data["prototypes"] = build_prototypes(matrix, names)
+        self._publish(data)
+
+    def _publish(self, data):
+        # Build outside the lock; only the swap itself is serialized
+        matcher = build_matcher(data)
+        with self._lock:
+            self._snapshot = (self._snapshot[0] + 1, data, matcher)
@@ -0,0 +1,193 @@
+"""
+On-disk gallery format for the Face Recognition Attendance System.
+
+The gallery is a directory holding one contiguous float32 `.npy` matrix of
+encodings, an int32 array of identity ids, optional prototype arrays, and a
+small JSON header with the identity table, format and encoder versions.
+The matrix is opened with mmap, so loading is zero-copy and every process
+shares the same pages through the OS cache.
+
+Each save writes a new generation of data files and then atomically replaces
+the header, so readers always see a complete gallery.
+
+Run this file directly to convert an existing encodings.pickle.
+"""
+
+import json
+import os
+import pickle
+import numpy as np
+from config import GALLERY_DIR, ENCODINGS_FILE
+
+GALLERY_FORMAT = "face-gallery"
+GALLERY_FORMAT_VERSION = 1
+HEADER_FILE = "gallery.json"
+
+
+def _header_path(directory):
+    return os.path.join(directory, HEADER_FILE)
+
+
+def read_header(directory=GALLERY_DIR):
+    """
+    Reads the gallery header.
+
+    Args:
+        directory (str): The gallery directory.
+
+    Returns:
+        dict: The header, or None if there is no gallery in the directory.
+    """
+    path = _header_path(directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        header = json.load(f)
+    if header.get("format") != GALLERY_FORMAT or header.get("format_version") != GALLERY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported gallery format in {path}")
+    return header
+
+
+def _write_array(directory, name, generation, array):
+    file_name = f"{name}.{generation}.npy"
+    np.save(os.path.join(directory, file_name), array)
+    return file_name
+
+
+def save_gallery(encodings, names, directory=GALLERY_DIR, encoder=None, prototypes=None):
+    """
+    Saves a gallery as a new generation.
+
+    Args:
+        encodings (list or np.ndarray): The face encodings.
+        names (list): The name for each encoding, in the same order.
+        directory (str): The gallery directory.
+        encoder (dict, optional): The settings the encodings were produced with.
+        prototypes (dict, optional): The output of `gallery.build_prototypes`.
+
+    Returns:
+        dict: The header that was written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous = read_header(directory)
+    generation = previous["generation"] + 1 if previous else 1
+
+    if len(names):
+        matrix = np.asarray(encodings, dtype=np.float32).reshape(len(names), -1)
+    else:
+        matrix = np.empty((0, 128), dtype=np.float32)
+    identities = sorted(set(names))
+    identity_index = {name: i for i, name in enumerate(identities)}
+    identity_ids = np.array([identity_index[name] for name in names], dtype=np.int32)
+
+    files = {
+        "encodings": _write_array(directory, "encodings", generation, np.ascontiguousarray(matrix)),
+        "identity_ids": _write_array(directory, "identity_ids", generation, identity_ids),
+    }
+    header = {
+        "format": GALLERY_FORMAT,
+        "format_version": GALLERY_FORMAT_VERSION,
+        "generation": generation,
+        "encoder": encoder or {},
+        "count": len(names),
+        "dim": int(matrix.shape[1]),
+        "dtype": "float32",
+        "identities": identities,
+        "files": files,
+    }
+
+    if prototypes:
+        proto_ids = np.array([identity_index[name] for name in prototypes["names"]], dtype=np.int32)
+        radii = dict(zip(prototypes["identity_names"], np.asarray(prototypes["radii"]).tolist()))
+        files["prototypes"] = _write_array(
+            directory, "prototypes", generation, np.asarray(prototypes["encodings"], dtype=np.float32)
+        )
+        files["prototype_ids"] = _write_array(directory, "prototype_ids", generation, proto_ids)
+        header["prototype_radii"] = [radii[name] for name in identities]
+
+    # Replacing the header is the commit point of the new generation
+    tmp_path = _header_path(directory) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_path, _header_path(directory))
+
+    _remove_old_generations(directory, keep=[header, previous])
+    return header
+
+
+def _remove_old_generations(directory, keep):
+    """Deletes data files that belong to neither the new nor the previous generation."""
+    referenced = {file_name for header in keep if header for file_name in header["files"].values()}
+    for file_name in os.listdir(directory):
+        if file_name.endswith(".npy") and file_name not in referenced:
+            try:
+                os.remove(os.path.join(directory, file_name))
+            except OSError:
+                pass
+
+
+def load_gallery(directory=GALLERY_DIR, mmap=True):
+    """
+    Opens a saved gallery.
+
+    Args:
+        directory (str): The gallery directory.
+        mmap (bool): Whether to memory-map the encodings instead of reading them.
+
+    Returns:
+        dict: The "encodings" matrix, the "names", "identity_ids" and "identities",
+        the "generation" and "encoder" from the header, and "prototypes" if present.
+        None if there is no gallery in the directory.
+    """
+    header = read_header(directory)
+    if header is None:
+        return None
+
+    mmap_mode = "r" if mmap else None
+    files = header["files"]
+    encodings = np.load(os.path.join(directory, files["encodings"]), mmap_mode=mmap_mode)
+    identity_ids = np.load(os.path.join(directory, files["identity_ids"]))
+    if encodings.shape != (header["count"], header["dim"]) or len(identity_ids) != header["count"]:
+        raise ValueError(f"Gallery files in {directory} do not match their header")
+
+    identities = header["identities"]
+    table = np.asarray(identities, dtype=object)
+    data = {
+        "encodings": encodings,
+        "names": table[identity_ids].tolist(),
+        "identity_ids": identity_ids,
+        "identities": identities,
+        "generation": header["generation"],
+        "encoder": header["encoder"],
+    }
+
+    if "prototypes" in files:
+        proto_ids = np.load(os.path.join(directory, files["prototype_ids"]))
+        data["prototypes"] = {
+            "encodings": np.load(os.path.join(directory, files["prototypes"]), mmap_mode=mmap_mode),
+            "names": table[proto_ids].tolist(),
+            "identity_names": identities,
+            "radii": np.asarray(header["prototype_radii"], dtype=np.float32),
+        }
+    return data
+
+
+def convert_pickle(pickle_path=ENCODINGS_FILE, directory=GALLERY_DIR):
+    """
+    Converts a legacy encodings.pickle into the gallery format.
+
+    Args:
+        pickle_path (str): The pickle written by older versions of encode_faces.py.
+        directory (str): The gallery directory to write.
+
+    Returns:
+        dict: The header that was written.
+    """
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+    return save_gallery(data["encodings"], data["names"], directory, prototypes=data.get("prototypes"))
+
+
+if __name__ == "__main__":
+    written = convert_pickle()
+    print(f"Converted {written['count']} encodings of {len(written['identities'])} people to {GALLERY_DIR}")
@@ -0,0 +1,124 @@
+"""
+Background recognition worker for the Face Recognition Attendance System.
+
+Recognition runs on its own thread, fed through a one-slot mailbox where the
+newest frame always replaces any frame still waiting. The video thread never
+waits on detection, encoding or attendance writes; it only reads the most
+recent results.
+"""
+
+import threading
+
+
+class LatestFrameMailbox:
+    """
+    A one-slot mailbox where the latest item wins.
+
+    Putting an item while another is still waiting drops the older one, so the
+    consumer always works on the freshest frame and latency stays bounded.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        """
+        Stores an item, replacing any item that has not been taken yet.
+
+        Args:
+            item: The item to store.
+        """
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def get(self):
+        """
+        Waits for the next item.
+
+        Returns:
+            The latest item, or None once the mailbox is closed.
+        """
+        with self._cond:
+            while self._item is None and not self._closed:
+                self._cond.wait()
+            item, self._item = self._item, None
+            return None if self._closed else item
+
+    def close(self):
+        """Wakes up the consumer and makes every later `get` return None."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class RecognitionWorker:
+    """
+    Runs a processing function on the latest submitted frame in a background thread.
+    """
+
+    def __init__(self, process, name="recognition-worker"):
+        """
+        Initializes the RecognitionWorker.
+
+        Args:
+            process (callable): Called with the submitted arguments; its return
+                value becomes the latest result.
+            name (str): The name of the worker thread.
+        """
+        self._process = process
+        self._mailbox = LatestFrameMailbox()
+        self._lock = threading.Lock()
+        self._result = []
+        self.processed = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    @property
+    def dropped(self):
+        """The number of frames replaced before the worker got to them."""
+        return self._mailbox.dropped
+
+    @property
+    def latest(self):
+        """The result of the most recently processed frame."""
+        with self._lock:
+            return self._result
+
+    def start(self):
+        """Starts the worker thread."""
+        self._thread.start()
+
+    def submit(self, *args):
+        """
+        Hands a frame to the worker without waiting.
+
+        Args:
+            *args: The arguments passed to the processing function.
+        """
+        self._mailbox.put(args)
+
+    def stop(self, timeout=1.0):
+        """
+        Stops the worker thread.
+
+        Args:
+            timeout (float): How long to wait for the frame in progress to finish.
+        """
+        self._mailbox.close()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            args = self._mailbox.get()
+            if args is None:
+                break
+            result = self._process(*args)
+            with self._lock:
+                self._result = result
+                self.processed += 1
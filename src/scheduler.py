@@ -0,0 +1,142 @@
+"""
+Recognition scheduling for the Face Recognition Attendance System.
+
+This module decides when a stream runs its next recognition pass. Instead of
+a fixed frame stride, it targets a maximum recognition rate and a CPU budget
+per stream, measured from the actual latency of each stage, and backs off
+when no face has been seen for a while.
+"""
+
+import time
+from config import (
+    RECOGNITION_MAX_RATE,
+    RECOGNITION_CPU_BUDGET,
+    RECOGNITION_IDLE_AFTER,
+    RECOGNITION_IDLE_MAX_INTERVAL,
+)
+
+
+class RecognitionScheduler:
+    """
+    Spaces out recognition passes in time.
+
+    The interval between passes is the larger of the rate limit and the
+    interval that keeps measured recognition time within the CPU budget.
+    Recognition time is averaged over whole passes, counting only the stages
+    each pass actually ran plus the work done on frames in between, such as
+    following tracks.
+    While the stream is idle, the interval doubles after every empty pass
+    up to a ceiling, and resets as soon as a face shows up.
+    """
+
+    def __init__(
+        self,
+        max_rate=RECOGNITION_MAX_RATE,
+        cpu_budget=RECOGNITION_CPU_BUDGET,
+        idle_after=RECOGNITION_IDLE_AFTER,
+        idle_max_interval=RECOGNITION_IDLE_MAX_INTERVAL,
+        smoothing=0.2,
+    ):
+        """
+        Initializes the RecognitionScheduler.
+
+        Args:
+            max_rate (float): The maximum number of recognition passes per second.
+            cpu_budget (float): The maximum fraction of one core spent on recognition.
+            idle_after (float): Seconds without a face before backing off.
+            idle_max_interval (float): The longest interval between passes while idle.
+            smoothing (float): The weight of the newest sample in the latency averages.
+        """
+        self.max_rate = max_rate
+        self.cpu_budget = cpu_budget
+        self.idle_after = idle_after
+        self.idle_max_interval = idle_max_interval
+        self.smoothing = smoothing
+
+        self.stage_latency = {}
+        self.busy = None
+        self.pending = {}
+        self.interval = 1.0 / max_rate
+        self.next_run = 0.0
+        self.last_face_time = None
+        self.passes = 0
+        self.skipped = 0
+
+    def should_run(self, now=None):
+        """
+        Tells whether a recognition pass is due.
+
+        Args:
+            now (float, optional): The current monotonic time. Defaults to `time.monotonic()`.
+
+        Returns:
+            bool: True if the caller should run recognition on this frame.
+        """
+        now = time.monotonic() if now is None else now
+        if now >= self.next_run:
+            return True
+        self.skipped += 1
+        return False
+
+    def add(self, stage, seconds):
+        """
+        Records work done between passes, charged to the next pass.
+
+        Args:
+            stage (str): The stage, e.g. "follow".
+            seconds (float): The seconds it took.
+        """
+        self.pending[stage] = self.pending.get(stage, 0.0) + seconds
+
+    def record(self, started, stage_times, faces_found, now=None):
+        """
+        Records a finished recognition pass and schedules the next one.
+
+        Args:
+            started (float): The monotonic time the pass started.
+            stage_times (dict): The seconds spent in each stage, e.g. {"detect": 0.05}.
+            faces_found (int): The number of faces the pass detected.
+            now (float, optional): The current monotonic time. Defaults to `time.monotonic()`.
+        """
+        now = time.monotonic() if now is None else now
+        self.passes += 1
+        stage_times = dict(stage_times)
+        for stage, seconds in self.pending.items():
+            stage_times[stage] = stage_times.get(stage, 0.0) + seconds
+        self.pending = {}
+        for stage, seconds in stage_times.items():
+            previous = self.stage_latency.get(stage, seconds)
+            self.stage_latency[stage] = previous + self.smoothing * (seconds - previous)
+
+        # A gated pass skips detection and encoding, so only this pass's stages count
+        busy = sum(stage_times.values())
+        self.busy = busy if self.busy is None else self.busy + self.smoothing * (busy - self.busy)
+        base_interval = max(1.0 / self.max_rate, self.busy / self.cpu_budget)
+
+        if faces_found or self.last_face_time is None:
+            # The first pass starts the idle clock even without a face
+            self.last_face_time = now
+            self.interval = base_interval
+        elif now - self.last_face_time > self.idle_after:
+            # Nothing seen recently, keep doubling the gap up to the ceiling
+            self.interval = min(max(self.interval * 2, base_interval), max(self.idle_max_interval, base_interval))
+        else:
+            self.interval = base_interval
+
+        self.next_run = started + self.interval
+
+    def stats(self):
+        """
+        Returns the scheduler state for display or logging.
+
+        Returns:
+            dict: The current interval, pass counts, smoothed busy time per pass
+            and smoothed stage latencies.
+        """
+        return {
+            "interval": self.interval,
+            "busy": self.busy,
+            "passes": self.passes,
+            "skipped": self.skipped,
+            "stage_latency": dict(self.stage_latency),
+        }
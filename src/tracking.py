@@ -0,0 +1,239 @@
+"""
+Face tracking for the Face Recognition Attendance System.
+
+This module keeps faces alive as tracks between detection passes, so that a
+face is only encoded when its track is new or due for re-verification, and
+every frame can be drawn with up-to-date boxes.
+"""
+
+import itertools
+import cv2
+import numpy as np
+from config import (
+    TRACK_IOU_THRESHOLD,
+    TRACK_MAX_MISSES,
+    TRACK_MAX_GATED_PASSES,
+    TRACK_REVERIFY_SECONDS,
+    TRACK_USE_OPTICAL_FLOW,
+)
+from gallery import UNKNOWN_NAME
+
+
+def box_iou(a, b):
+    """
+    Computes the intersection over union of two (top, right, bottom, left) boxes.
+
+    Args:
+        a (tuple): The first box.
+        b (tuple): The second box.
+
+    Returns:
+        float: The IoU, between 0 and 1.
+    """
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _centroid(box):
+    return ((box[3] + box[1]) / 2.0, (box[0] + box[2]) / 2.0)
+
+
+class Track:
+    """A face followed across frames, with the identity it was last verified as."""
+
+    _ids = itertools.count()
+
+    def __init__(self, box):
+        self.id = next(Track._ids)
+        self.box = box
+        self.name = None
+        self.distance = None
+        self.verified_at = None
+        self.misses = 0
+
+
+class FaceTracker:
+    """
+    Associates detected faces with existing tracks.
+
+    Detections are matched to tracks greedily by IoU, with a centroid-distance
+    fallback for faces that moved further than their own size overlap allows.
+    Between detection passes, tracks can be moved with sparse optical flow.
+    Passes skipped by the frame gate age the tracks too, so a face that left
+    while nothing else moved does not stay on screen.
+    """
+
+    def __init__(
+        self,
+        iou_threshold=TRACK_IOU_THRESHOLD,
+        max_misses=TRACK_MAX_MISSES,
+        reverify_seconds=TRACK_REVERIFY_SECONDS,
+        use_optical_flow=TRACK_USE_OPTICAL_FLOW,
+        max_gated_passes=TRACK_MAX_GATED_PASSES,
+    ):
+        """
+        Initializes the FaceTracker.
+
+        Args:
+            iou_threshold (float): The minimum IoU for a detection to continue a track.
+            max_misses (int): The number of detection passes a track may go unseen.
+            reverify_seconds (float): How often a known track is re-encoded and re-matched.
+            use_optical_flow (bool): Whether to move tracks between detection passes.
+            max_gated_passes (int): The number of gated passes in a row that count as a
+                detection pass without faces.
+        """
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.reverify_seconds = reverify_seconds
+        self.use_optical_flow = use_optical_flow
+        self.max_gated_passes = max_gated_passes
+        self.tracks = []
+        self.prev_gray = None
+        self.gated_passes = 0
+
+    def update(self, boxes, gray=None):
+        """
+        Updates the tracks with the faces found by a detection pass.
+
+        Args:
+            boxes (list): The detected (top, right, bottom, left) boxes.
+            gray (np.ndarray, optional): The grayscale frame the boxes were found in,
+                kept as the reference for optical flow.
+
+        Returns:
+            list: The live tracks, one per detected box.
+        """
+        unmatched_tracks = set(range(len(self.tracks)))
+        unmatched_boxes = set(range(len(boxes)))
+        assigned = {}
+
+        pairs = sorted(
+            ((box_iou(self.tracks[t].box, boxes[b]), t, b) for t in unmatched_tracks for b in unmatched_boxes),
+            reverse=True,
+        )
+        for iou, t, b in pairs:
+            if iou < self.iou_threshold:
+                break
+            if t in unmatched_tracks and b in unmatched_boxes:
+                assigned[b] = t
+                unmatched_tracks.discard(t)
+                unmatched_boxes.discard(b)
+
+        # Fall back to centroid distance, relative to the face width
+        for b in sorted(unmatched_boxes):
+            cx, cy = _centroid(boxes[b])
+            width = boxes[b][1] - boxes[b][3]
+            best, best_dist = None, 0.5 * width
+            for t in unmatched_tracks:
+                tx, ty = _centroid(self.tracks[t].box)
+                dist = np.hypot(cx - tx, cy - ty)
+                if dist < best_dist:
+                    best, best_dist = t, dist
+            if best is not None:
+                assigned[b] = best
+                unmatched_tracks.discard(best)
+
+        live = []
+        for b, box in enumerate(boxes):
+            if b in assigned:
+                track = self.tracks[assigned[b]]
+                track.box = box
+                track.misses = 0
+            else:
+                track = Track(box)
+            live.append(track)
+
+        # Keep unseen tracks for a few passes so a missed detection does not drop them
+        for t in unmatched_tracks:
+            track = self.tracks[t]
+            track.misses += 1
+            if track.misses <= self.max_misses:
+                live.append(track)
+
+        self.tracks = live
+        self.prev_gray = gray
+        self.gated_passes = 0
+        return [track for track in live if track.misses == 0]
+
+    def skip(self, gray):
+        """
+        Carries the tracks through a pass the frame gate skipped detection on.
+
+        The tracks are moved with optical flow, and every `max_gated_passes`
+        skipped passes in a row count as a detection pass that found no faces.
+
+        Args:
+            gray (np.ndarray): The current grayscale frame, at the same scale as the boxes.
+        """
+        self.follow(gray)
+        self.gated_passes += 1
+        if self.gated_passes >= self.max_gated_passes:
+            self.update([], gray)
+
+    def needs_encoding(self, track, now):
+        """
+        Tells whether a track has to be encoded and matched on this pass.
+
+        Args:
+            track (Track): The track to check.
+            now (float): The current time in seconds.
+
+        Returns:
+            bool: True for new, unknown and invalidated tracks, and for known
+            tracks due for re-verification.
+        """
+        if track.name is None or track.name == UNKNOWN_NAME or track.verified_at is None:
+            return True
+        return now - track.verified_at >= self.reverify_seconds
+
+    def verify(self, track, name, distance, now):
+        """
+        Records the identity a track was matched to.
+
+        Args:
+            track (Track): The track that was encoded.
+            name (str): The matched name, or "Unknown".
+            distance (float): The match distance.
+            now (float): The current time in seconds.
+        """
+        track.name = name
+        track.distance = distance
+        track.verified_at = now
+
+    def invalidate(self):
+        """Forces every track to be re-encoded on the next pass, e.g. after the gallery changed."""
+        for track in self.tracks:
+            track.verified_at = None
+
+    def follow(self, gray):
+        """
+        Moves every track by the median optical flow inside its box.
+
+        Args:
+            gray (np.ndarray): The current grayscale frame, at the same scale as the boxes.
+        """
+        if not self.use_optical_flow or self.prev_gray is None or not self.tracks:
+            self.prev_gray = gray
+            return
+
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            mask = np.zeros_like(gray)
+            mask[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)] = 255
+            points = cv2.goodFeaturesToTrack(self.prev_gray, maxCorners=30, qualityLevel=0.01, minDistance=3, mask=mask)
+            if points is None:
+                continue
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None)
+            ok = status.reshape(-1) == 1
+            if not ok.any():
+                continue
+            dx, dy = np.median((moved - points).reshape(-1, 2)[ok], axis=0)
+            dx, dy = int(round(dx)), int(round(dy))
+            track.box = (top + dy, right + dx, bottom + dy, left + dx)
+
+        self.prev_gray = gray
@@ -3,6 +3,7 @@ Utility functions for the Face Recognition Attendance System.
 
 This module provides helper functions for managing the dataset of face images,
 including saving and deleting images, and listing the people in the dataset.
+Every change is recorded in the dataset catalog.
 """
 
 import os
@@ -10,6 +11,7 @@ import shutil
 from PIL import Image
 from datetime import datetime
 from config import DATASET_DIR
+from dataset_catalog import get_dataset_catalog
 
 def save_image(uploaded_file, person_name):
     """
@@ -38,11 +40,17 @@ def save_image(uploaded_file, person_name):
         if image.mode != 'RGB':
             image = image.convert('RGB')
         image.save(file_path, "JPEG")
-        return file_path
     except Exception as e:
         print(f"Could not save image: {e}")
         return None
 
+    # The thumbnail is made from the image already in memory
+    try:
+        get_dataset_catalog().add_image(person_folder_name, file_path, image)
+    except Exception as e:
+        print(f"Could not add {file_path} to the dataset catalog: {e}")
+    return file_path
+
 def delete_person(person_name):
     """
     Deletes the entire directory for a given person.
@@ -58,6 +66,7 @@ def delete_person(person_name):
     if os.path.exists(person_dir):
         try:
             shutil.rmtree(person_dir)
+            get_dataset_catalog().remove_person(person_folder_name)
             return True
         except Exception as e:
             print(f"Error deleting directory {person_dir}: {e}")
@@ -66,11 +75,9 @@ def delete_person(person_name):
 
 def list_people():
     """
-    Lists all people (directories) in the dataset folder.
+    Lists all people (directories) in the dataset folder, from the dataset catalog.
 
     Returns:
         list: A sorted list of people in the dataset.
     """
-    if not os.path.exists(DATASET_DIR):
-        return []
-    return sorted([name for name in os.listdir(DATASET_DIR) if os.path.isdir(os.path.join(DATASET_DIR, name))])
+    return get_dataset_catalog().people()
@@ -0,0 +1,146 @@
+"""
+Streaming chatbot responses against a local fake OpenAI-compatible server.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("streamlit")
+
+import chatbot_service
+from attendance import CsvAttendanceStore
+from chatbot_service import AttendanceChatbot, AttendanceQueryRouter, ResponseCache
+
+CHUNKS = ["Alice ", "punched ", "in ", "at ", "09:00."]
+
+
+class FakeCompletions(BaseHTTPRequestHandler):
+    """
+    Streams CHUNKS as chat completion chunks, one every `delay` seconds.
+
+    The prompt picks the behaviour: "drop" ends the stream before the model
+    finishes, and "stall" never answers.
+    """
+
+    protocol_version = "HTTP/1.0"
+    delay = 0.05
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, data):
+        self.wfile.write(b"data: " + json.dumps(data).encode() + b"\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        self.requests.append(body)
+        if prompt == "stall":
+            time.sleep(5)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for i, text in enumerate(CHUNKS):
+                if prompt == "drop" and i == 2:
+                    return
+                time.sleep(self.delay)
+                self._send({
+                    "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+                })
+            self._send({
+                "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            })
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away, e.g. after cancelling
+            pass
+
+
+@pytest.fixture
+def server():
+    FakeCompletions.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeCompletions)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def chatbot(server, tmp_path, monkeypatch):
+    # The shared client is built from the environment, as in the app
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setenv("GROQ_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(chatbot_service, "_client", None)
+    router = AttendanceQueryRouter(CsvAttendanceStore(str(tmp_path / "attendance_log.csv")))
+    return AttendanceChatbot(cache=ResponseCache(), timeout=0.5, router=router)
+
+
+def test_streams_chunks_and_caches_the_answer(chatbot):
+    started = time.monotonic()
+    stream = chatbot.stream_response("When did Alice punch in?")
+    first = next(stream)
+    first_chunk_seconds = time.monotonic() - started
+
+    assert first == CHUNKS[0]
+    assert first_chunk_seconds < 0.5
+    assert [first] + list(stream) == CHUNKS
+    assert len(FakeCompletions.requests) == 1
+    assert FakeCompletions.requests[0]["stream"] is True
+
+    # The finished answer comes back from the cache in one chunk, without a request
+    assert list(chatbot.stream_response("when did alice punch in")) == ["".join(CHUNKS)]
+    assert len(FakeCompletions.requests) == 1
+    assert chatbot.get_response("When did Alice punch in?") == "".join(CHUNKS)
+
+
+def test_shared_client_is_reused(chatbot):
+    other = AttendanceChatbot(cache=ResponseCache(), router=chatbot.router)
+    assert other.client is chatbot.client
+
+
+def test_cancel_stops_the_stream_and_is_not_cached(chatbot):
+    cancel = threading.Event()
+    stream = chatbot.stream_response("When did Alice punch in?", cancel=cancel)
+    received = [next(stream)]
+    cancel.set()
+    received += list(stream)
+
+    assert received == CHUNKS[:1]
+    assert chatbot.cache.stats()["entries"] == 0
+
+    # Closing the generator early also leaves nothing in the cache
+    stream = chatbot.stream_response("When did Alice punch in?")
+    next(stream)
+    stream.close()
+    assert chatbot.cache.stats()["entries"] == 0
+    assert list(chatbot.stream_response("When did Alice punch in?")) == CHUNKS
+    assert chatbot.cache.stats()["entries"] == 1
+
+
+def test_cut_off_stream_is_not_cached(chatbot):
+    assert list(chatbot.stream_response("drop")) == CHUNKS[:2]
+    assert chatbot.cache.stats()["entries"] == 0
+
+
+def test_timeout_is_reported_and_not_cached(chatbot):
+    started = time.monotonic()
+    response = chatbot.get_response("stall")
+
+    assert response.startswith("Sorry, I encountered an error:")
+    # One retry at most, each bounded by the request timeout
+    assert time.monotonic() - started < 3
+    assert chatbot.cache.stats()["entries"] == 0
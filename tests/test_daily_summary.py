@@ -0,0 +1,119 @@
+"""
+The stores' daily summary against `calculate_working_hours` on the same punches.
+"""
+
+import os
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("plotly")
+
+from analytics_dashboard import calculate_working_hours, daily_attendance
+from attendance import CsvAttendanceStore, SqliteAttendanceStore
+
+
+def random_events(rng, count):
+    """Punches of a few people over ten days, including Sundays and out-of-order and same-second punches."""
+    names = ["alice", "bob", "carol"]
+    start = datetime(2025, 7, 1, 8, 0, 0)
+    return [
+        (rng.choice(names), start + timedelta(days=rng.randint(0, 9), seconds=rng.choice([0, 1, 3600, 4 * 3600, 9 * 3600])))
+        for _ in range(count)
+    ]
+
+
+def dashboard_hours(store):
+    """Runs the reference computation on the store's punches, prepared as the dashboard does."""
+    df = store.read()
+    df["DateTime"] = pd.to_datetime(df["Date"] + " " + df["Time"], format="%Y-%m-%d %H:%M:%S")
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    return calculate_working_hours(df.sort_values("DateTime", kind="stable"))
+
+
+def assert_summary_matches(store):
+    expected = dashboard_hours(store).sort_values(["Name", "Date"], ignore_index=True)
+    result = daily_attendance(store.read_summary()).sort_values(["Name", "Date"], ignore_index=True)
+    assert len(result) == len(expected)
+    for column in expected.columns:
+        assert result[column].tolist() == expected[column].tolist(), column
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def make_store(request, tmp_path):
+    def make():
+        if request.param == "csv":
+            return CsvAttendanceStore(str(tmp_path / "attendance_log.csv"))
+        return SqliteAttendanceStore(str(tmp_path / "attendance.db"), import_from=None)
+    return make
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_summary_matches_working_hours(make_store, seed):
+    rng = random.Random(seed)
+    store = make_store()
+    events = random_events(rng, 80)
+    # Record in a few batches, reading the summary in between so it is advanced, not rebuilt
+    for i in range(0, len(events), 20):
+        store.record_batch(events[i:i + 20])
+        assert_summary_matches(store)
+
+
+def test_csv_summary_follows_other_writers(tmp_path):
+    log_file = str(tmp_path / "attendance_log.csv")
+    store = CsvAttendanceStore(log_file)
+    store.record_batch(random_events(random.Random(1), 30))
+    assert_summary_matches(store)
+
+    # Another process appends to the same log, including out-of-order punches
+    CsvAttendanceStore(log_file).record_batch(random_events(random.Random(2), 30))
+    assert_summary_matches(store)
+
+    # The log is edited by hand and replaced
+    with open(log_file) as f:
+        lines = f.readlines()
+    with open(log_file + ".edit", "w") as f:
+        f.writelines(lines[:len(lines) // 2])
+    os.replace(log_file + ".edit", log_file)
+    assert_summary_matches(store)
+    assert len(store.read()) == len(lines) // 2 - 1
+
+
+def test_csv_archive_keeps_backfilled_punches(tmp_path):
+    log_file = str(tmp_path / "attendance_log.csv")
+    archive_dir = str(tmp_path / "archive")
+    store = CsvAttendanceStore(log_file, archive_dir=archive_dir)
+    events = random_events(random.Random(3), 60)
+
+    # Every month of the events is closed, so each batch is backfilled into its partition
+    for i in range(0, len(events), 20):
+        store.record_batch(events[i:i + 20])
+        assert_summary_matches(store)
+    assert len(store.read()) == len(events)
+    assert store.read_summary()["WorkingSeconds"].dtype == "int64"
+
+    # A run interrupted after writing the partition leaves the month in the log too
+    archived_log = open(log_file).read()
+    store.record_batch(random_events(random.Random(4), 20))
+    with open(log_file, "w") as f:
+        f.write(archived_log)
+    CsvAttendanceStore(log_file, archive_dir=archive_dir)
+    assert len(store.read()) == len(events) + 20
+    assert_summary_matches(store)
+
+
+def test_csv_cache_sees_appends_within_the_same_mtime(tmp_path):
+    log_file = str(tmp_path / "attendance_log.csv")
+    store = CsvAttendanceStore(log_file)
+    store.record_batch(random_events(random.Random(5), 10))
+    assert_summary_matches(store)
+
+    # Another writer appends within the filesystem's timestamp granularity
+    stat = os.stat(log_file)
+    CsvAttendanceStore(log_file).record_batch(random_events(random.Random(6), 10))
+    os.utime(log_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert len(store.read()) == 20
+    assert_summary_matches(store)
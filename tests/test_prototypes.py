@@ -0,0 +1,94 @@
+"""
+Equivalence of `PrototypeMatcher` with the exact scan of `GalleryMatcher`.
+"""
+
+import numpy as np
+import pytest
+
+from config import FACE_MATCH_TOLERANCE
+from gallery import UNKNOWN_NAME, GalleryMatcher, PrototypeMatcher, build_prototypes
+
+
+def random_gallery(rng):
+    """
+    Builds a gallery of identities clustered like face encodings.
+
+    Identity centers lie about 0.8 apart and encodings about 0.3 from their
+    center, so queries fall on both sides of the default tolerance. Some
+    identities have too few encodings to be compressed.
+    """
+    encodings, names = [], []
+    for i in range(rng.integers(1, 8)):
+        center = rng.normal(0, 0.05, 128)
+        for _ in range(rng.choice([1, 2, 4, 10, 30])):
+            encodings.append(center + rng.normal(0, 0.02, 128))
+            names.append(f"person{i}")
+    return np.asarray(encodings, dtype=np.float32), names
+
+
+def random_queries(rng, encodings):
+    """Mixes queries near enrolled encodings, exact copies of them and strangers."""
+    near = encodings[rng.integers(0, len(encodings), 20)] + rng.normal(0, rng.choice([0.01, 0.03, 0.05]), (20, 128))
+    copies = encodings[rng.integers(0, len(encodings), 3)]
+    strangers = rng.normal(0, 0.05, (7, 128))
+    return np.vstack([near, copies, strangers]).astype(np.float32)
+
+
+def assert_same_matches(result, expected, tolerance):
+    assert len(result) == len(expected)
+    for (name, distance, index), (expected_name, expected_distance, expected_index) in zip(result, expected):
+        assert (name, index) == (expected_name, expected_index)
+        if index >= 0:
+            # The exact scan expands the squared distance in float32, so it is off by up to ~1e-3 near zero
+            assert distance == pytest.approx(expected_distance, abs=1e-3)
+        else:
+            # Unknown faces report a lower bound on the nearest encoding, above the tolerance
+            assert tolerance < distance <= expected_distance + 1e-4
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_matches_exact_scan(seed):
+    rng = np.random.default_rng(seed)
+    encodings, names = random_gallery(rng)
+    queries = random_queries(rng, encodings)
+    prototypes = build_prototypes(encodings, names, k=int(rng.integers(1, 5)))
+
+    for tolerance in (0.3, FACE_MATCH_TOLERANCE, 2.0):
+        expected = GalleryMatcher(encodings, names, tolerance).match(queries)
+        result = PrototypeMatcher(encodings, names, prototypes, tolerance).match(queries)
+        assert_same_matches(result, expected, tolerance)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_exact_scan_at_the_tolerance(seed):
+    rng = np.random.default_rng(seed)
+    encodings, names = random_gallery(rng)
+    prototypes = build_prototypes(encodings, names)
+
+    # Queries just inside and just outside the tolerance of an enrolled encoding
+    directions = rng.normal(0, 1, (10, 128))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    anchors = encodings[rng.integers(0, len(encodings), 10)]
+    for offset in (-1e-3, 1e-3):
+        queries = (anchors + (FACE_MATCH_TOLERANCE + offset) * directions).astype(np.float32)
+        expected = GalleryMatcher(encodings, names).match(queries)
+        result = PrototypeMatcher(encodings, names, prototypes).match(queries)
+        assert_same_matches(result, expected, FACE_MATCH_TOLERANCE)
+
+
+def test_single_encoding_at_the_tolerance():
+    encoding = np.zeros((1, 128), dtype=np.float32)
+    matcher = PrototypeMatcher(encoding, ["alice"], build_prototypes(encoding, ["alice"]), tolerance=0.5)
+    inside, outside = np.zeros((2, 128), dtype=np.float32)
+    inside[0], outside[0] = 0.499, 0.501
+
+    (name, distance, index), (other, other_distance, other_index) = matcher.match([inside, outside])
+    assert (name, index) == ("alice", 0)
+    assert distance == pytest.approx(0.499, abs=1e-6)
+    assert (other, other_index) == (UNKNOWN_NAME, -1)
+    assert other_distance == pytest.approx(0.501, abs=1e-6)
+
+
+def test_no_queries():
+    encodings, names = random_gallery(np.random.default_rng(0))
+    assert PrototypeMatcher(encodings, names, build_prototypes(encodings, names)).match([]) == []
@@ -0,0 +1,81 @@
+"""
+Routing of attendance questions between the local lookups and the model.
+"""
+
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("streamlit")
+
+from attendance import CsvAttendanceStore
+from chatbot_service import AttendanceQueryRouter
+
+# A Wednesday
+TODAY = date(2025, 7, 9)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CsvAttendanceStore(str(tmp_path / "attendance_log.csv"))
+    store.record_batch([
+        # Monday: alice works a full day, kathit a half day
+        ("alice", datetime(2025, 7, 7, 9, 0)),
+        ("kathit", datetime(2025, 7, 7, 9, 0)),
+        ("kathit", datetime(2025, 7, 7, 14, 0)),
+        ("alice", datetime(2025, 7, 7, 18, 0)),
+        # Today: alice has punched in; a visitor who was never enrolled punched too
+        ("alice", datetime(2025, 7, 9, 9, 0)),
+        ("visitor", datetime(2025, 7, 9, 10, 0)),
+    ])
+    return store
+
+
+@pytest.mark.parametrize("question", [
+    "what are the office hours today",
+    "What are the opening hours this week?",
+    "how many hours is a working day",
+    "how many hours did everyone work this week",
+    "how many hours did bob work today",
+])
+def test_hours_questions_without_work_or_a_known_name_go_to_the_model(store, question):
+    router = AttendanceQueryRouter(store)
+    assert router.route(question, TODAY) is None
+    assert router.answer(question, TODAY) is None
+
+
+def test_hours_worked_by_a_known_name(store):
+    router = AttendanceQueryRouter(store)
+    assert router.route("How many hours did kathit work this week?", TODAY) == (
+        "hours", None, ["kathit"], date(2025, 7, 7), TODAY,
+    )
+    assert router.answer("hours kathit worked on 2025-07-07", TODAY) == (
+        "kathit worked 5.0 hours on 2025-07-07 (1 day with punches)."
+    )
+    assert router.answer("how many hours did alice spend at work this week", TODAY) == (
+        "alice worked 9.0 hours from 2025-07-07 to 2025-07-09 (2 days with punches)."
+    )
+
+
+def test_absence_needs_a_roster(store):
+    assert AttendanceQueryRouter(store).route("who is absent today", TODAY) is None
+    assert AttendanceQueryRouter(store, roster=lambda: []).answer("who is absent today", TODAY) is None
+    # Other statuses are read from the log alone
+    assert AttendanceQueryRouter(store).answer("who had a full day on 2025-07-07", TODAY) == (
+        "Full day on 2025-07-07: alice."
+    )
+
+
+def test_absence_is_counted_against_the_roster(store):
+    router = AttendanceQueryRouter(store, roster=lambda: ["alice", "bob", "kathit"])
+
+    # The visitor punched in but is not enrolled; bob never punched but is
+    assert router.answer("who is absent today", TODAY) == "Absent on 2025-07-09: bob, kathit."
+    assert router.answer("who was absent on 2025-07-07", TODAY) == "Absent on 2025-07-07: bob."
+    assert router.answer("who was absent this week", TODAY) == "\n".join([
+        "Absent from 2025-07-07 to 2025-07-09:",
+        "- 2025-07-07: bob",
+        "- 2025-07-08: alice, bob, kathit",
+        "- 2025-07-09: bob, kathit",
+    ])
@@ -0,0 +1,141 @@
+"""
+Equivalence of the vectorized `calculate_working_hours` with the original per-group loop.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("plotly")
+
+from analytics_dashboard import calculate_working_hours, decimal_to_time
+from config import REQUIRED_HOURS_FULL_DAY, REQUIRED_HOURS_HALF_DAY
+
+COLUMNS = ['Name', 'Date', 'WorkingHours', 'FormattedTime', 'AttendanceStatus', 'PunchIn', 'PunchOut', 'DayOfWeek']
+
+
+def reference_working_hours(df):
+    """The loop implementation `calculate_working_hours` replaced."""
+    df = df.sort_values(['Name', 'DateTime'])
+    results_list = []
+
+    for (name, day), group in df.groupby(['Name', 'Date']):
+        date_obj = pd.to_datetime(day).date()
+        day_of_week = date_obj.strftime('%A')
+
+        if day_of_week == 'Sunday':
+            continue
+
+        punches = group.sort_values('DateTime')
+
+        working_seconds = 0
+        punch_in_time = None
+        first_punch_in = None
+        last_punch_out = None
+
+        for _, row in punches.iterrows():
+            if row['Status'] == 'Punch In':
+                if punch_in_time is None:
+                    punch_in_time = row['DateTime']
+                    if first_punch_in is None:
+                        first_punch_in = punch_in_time
+            elif row['Status'] == 'Punch Out':
+                if punch_in_time is not None:
+                    working_seconds += (row['DateTime'] - punch_in_time).total_seconds()
+                    last_punch_out = row['DateTime']
+                    punch_in_time = None
+
+        working_hours = working_seconds / 3600
+        if working_hours >= REQUIRED_HOURS_FULL_DAY:
+            status = "Full Day"
+        elif working_hours >= REQUIRED_HOURS_HALF_DAY:
+            status = "Half Day"
+        else:
+            status = "Absent"
+
+        results_list.append({
+            'Name': name,
+            'Date': day,
+            'WorkingHours': round(working_hours, 2),
+            'FormattedTime': decimal_to_time(working_hours),
+            'AttendanceStatus': status,
+            'PunchIn': first_punch_in.time() if first_punch_in else None,
+            'PunchOut': last_punch_out.time() if last_punch_out else None,
+            'DayOfWeek': day_of_week
+        })
+
+    if not results_list:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.DataFrame(results_list)
+
+
+def random_log(rng):
+    """
+    Builds a punch log the way the dashboard prepares it.
+
+    Days span whole weeks, so Sundays are included. Statuses are drawn at
+    random, so a group can hold repeated Ins and Outs and stray statuses.
+    Times are drawn from a few clock times, so same-second punches are common.
+    Groups stay small enough for the original per-group sort to keep
+    same-second punches in log order.
+    """
+    names = [f"person{i}" for i in range(rng.randint(1, 4))]
+    first_day = date(2025, 7, 1) + timedelta(days=rng.randint(0, 6))
+    rows = []
+    for _ in range(rng.randint(0, 60)):
+        day = first_day + timedelta(days=rng.randint(0, 9))
+        seconds = rng.choice([8 * 3600, 9 * 3600, 13 * 3600, 18 * 3600]) + rng.randint(0, 3) * rng.choice([1, 3600])
+        status = rng.choices(["Punch In", "Punch Out", "Break"], weights=[5, 5, 1])[0]
+        rows.append((rng.choice(names), day, seconds, status))
+
+    df = pd.DataFrame(
+        [
+            {
+                "Name": name,
+                "Date": day,
+                "Time": f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}",
+                "Status": status,
+                "DateTime": datetime.combine(day, datetime.min.time()) + timedelta(seconds=seconds),
+            }
+            for name, day, seconds, status in rows
+        ],
+        columns=["Name", "Date", "Time", "Status", "DateTime"],
+    )
+    df["DateTime"] = pd.to_datetime(df["DateTime"])
+    return df.sort_values("DateTime", kind="stable")
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_loop_implementation(seed):
+    df = random_log(random.Random(seed))
+    expected = reference_working_hours(df)
+    result = calculate_working_hours(df)
+
+    assert list(result.columns) == COLUMNS
+    assert len(result) == len(expected)
+    if expected.empty:
+        return
+    for column in COLUMNS:
+        assert result[column].tolist() == expected[column].tolist(), column
+
+
+def test_empty_log():
+    df = pd.DataFrame(columns=["Name", "Date", "Time", "Status", "DateTime"])
+    df["DateTime"] = pd.to_datetime(df["DateTime"])
+    assert list(calculate_working_hours(df).columns) == COLUMNS
+    assert calculate_working_hours(df).empty
+
+
+def test_sunday_only_log():
+    sunday = date(2025, 7, 6)
+    df = pd.DataFrame({
+        "Name": ["a", "a"],
+        "Date": [sunday, sunday],
+        "Time": ["09:00:00", "18:00:00"],
+        "Status": ["Punch In", "Punch Out"],
+        "DateTime": pd.to_datetime(["2025-07-06 09:00:00", "2025-07-06 18:00:00"]),
+    })
+    assert calculate_working_hours(df).empty